@@ -9,7 +9,8 @@ def main():
     try:
         asyncio.run(init())
     except Exception as e:
-        logger.critical(str(e.with_traceback))
+        logger.critical("Server exited with an error", exc_info=e)
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
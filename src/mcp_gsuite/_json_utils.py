@@ -0,0 +1,19 @@
+"""JSON encoding for MCP tool results."""
+import json
+
+try:
+    # considerably faster encoder for large results, used when installed
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json(obj) -> str:
+    """Encodes a tool result as compact JSON.
+
+    Clients parse the result back into structures, so whitespace is omitted and
+    non-ASCII text is kept as-is rather than escaped.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
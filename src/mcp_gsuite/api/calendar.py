@@ -1,16 +1,18 @@
-from googleapiclient.discovery import build
 from .. import gauth
 from ..logs import logger
+from ..auth_utils import get_user_credentials, invalidate_on_unauthorized, on_unauthorized
+import functools
 import traceback
 from datetime import datetime
 import pytz
 
 class CalendarService():
     def __init__(self, user_id: str):
-        credentials = gauth.get_stored_credentials(user_id=user_id)
+        credentials = get_user_credentials(user_id)
         if not credentials:
             raise RuntimeError("No Oauth2 credentials stored")
-        self.service = build('calendar', 'v3', credentials=credentials)  # Note: using v3 for Calendar API
+        self.user_id = user_id
+        self.service = gauth.build_service('calendar', 'v3', user_id=user_id, credentials=credentials)  # Note: using v3 for Calendar API
     
     def list_calendars(self) -> list:
         """
@@ -40,6 +42,7 @@ class CalendarService():
         except Exception as e:
             logger.error(f"Error retrieving calendars: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return []
 
     def get_events(self, time_min=None, time_max=None, max_results=250, show_deleted=False, calendar_id: str ='primary'):
@@ -108,6 +111,7 @@ class CalendarService():
         except Exception as e:
             logger.error(f"Error retrieving calendar events: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return []
         
     def create_event(self, summary: str, start_time: str, end_time: str, 
@@ -165,6 +169,7 @@ class CalendarService():
         except Exception as e:
             logger.error(f"Error creating calendar event: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return None
         
     def delete_event(self, event_id: str, send_notifications: bool = True, calendar_id: str = 'primary') -> bool:
@@ -189,4 +194,15 @@ class CalendarService():
         except Exception as e:
             logger.error(f"Error deleting calendar event {event_id}: {str(e)}")
             logger.error(traceback.format_exc())
-            return False
\ No newline at end of file
+            invalidate_on_unauthorized(self.user_id, e)
+            return False
+
+
+@functools.lru_cache(maxsize=8)
+def get_calendar_service(user_id: str) -> CalendarService:
+    """Returns a CalendarService for user_id, reusing the built discovery client across tool calls."""
+    return CalendarService(user_id=user_id)
+
+
+# the cached client keeps using the credentials it was built with, so drop it once they are rejected
+on_unauthorized(get_calendar_service.cache_clear)
@@ -1,18 +1,43 @@
-from googleapiclient.discovery import build 
 from .. import gauth
 from ..logs import logger
+from ..auth_utils import get_user_credentials, invalidate_on_unauthorized, on_unauthorized
 import base64
+import functools
+import threading
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from typing import Tuple
 
+# Gmail accepts up to 100 calls per batch, but recommends at most 50 since
+# larger batches are likely to trip per-user rate limiting
+BATCH_SIZE = 50
+# Batch requests in flight at once across all calls; Gmail throttles concurrent requests per user,
+# so a few parallel batches already saturate what it will serve
+MAX_CONCURRENT_BATCHES = 3
+# Messages whose attachment IDs are remembered; message contents never change once stored
+ATTACHMENT_MAP_CACHE_SIZE = 256
+# Shared by every call so its threads, and the per-thread connections of get_authorized_http, are reused
+_batch_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES, thread_name_prefix="gmail-batch")
+# Headers _parse_message reads; query results only need these, not the full message payload
+METADATA_HEADERS = [
+    'Subject', 'From', 'To', 'Date', 'Cc', 'Bcc',
+    'Message-ID', 'In-Reply-To', 'References', 'Delivered-To',
+]
+
 
 class GmailService():
     def __init__(self, user_id: str):
-        credentials = gauth.get_stored_credentials(user_id=user_id)
+        credentials = get_user_credentials(user_id)
         if not credentials:
             raise RuntimeError("No Oauth2 credentials stored")
-        self.service = build('gmail', 'v1', credentials=credentials)
+        self.user_id = user_id
+        self.credentials = credentials
+        # message_id -> attachments keyed by part ID, least recently used first
+        self._attachment_maps: OrderedDict[str, dict] = OrderedDict()
+        self._attachment_maps_lock = threading.Lock()
+        self.service = gauth.build_service('gmail', 'v1', user_id=user_id, credentials=credentials)
 
     def _parse_message(self, txt, parse_body=False) -> dict | None:
         """
@@ -154,11 +179,13 @@ class GmailService():
             messages = result.get('messages', [])
             parsed = []
 
-            # Fetch full message details for each message
+            # Fetch metadata for each message; the body is not parsed, so skip downloading it
             for msg in messages:
                 txt = self.service.users().messages().get(
-                    userId='me', 
-                    id=msg['id']
+                    userId='me',
+                    id=msg['id'],
+                    format='metadata',
+                    metadataHeaders=METADATA_HEADERS,
                 ).execute()
                 parsed_message = self._parse_message(txt=txt, parse_body=False)
                 if parsed_message:
@@ -169,8 +196,56 @@ class GmailService():
         except Exception as e:
             logger.error(f"Error reading emails: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             raise e # Re-raise the exception to be caught by the tool
         
+    def _parse_message_with_attachments(self, message: dict) -> Tuple[dict, dict] | Tuple[None, dict]:
+        """
+        Parse a full Gmail message including its body and collect its attachment IDs.
+
+        Args:
+            message (dict): Raw message from Gmail API (fetched with the default 'full' format)
+
+        Returns:
+            Tuple[dict, dict]: Parsed email message and attachments keyed by part ID
+            Tuple[None, dict]: If parsing fails
+        """
+        # Parse the message with body included
+        parsed_email = self._parse_message(txt=message, parse_body=True)
+
+        if parsed_email is None:
+            return None, {}
+
+        attachments = {}
+        # Check if 'parts' exists in payload before trying to access it
+        if "payload" in message and "parts" in message["payload"]:
+            for part in message["payload"]["parts"]:
+                if "body" in part and "attachmentId" in part["body"]:
+                    attachment_id = part["body"]["attachmentId"]
+                    part_id = part["partId"]
+                    attachment = {
+                        "filename": part["filename"],
+                        "mimeType": part["mimeType"],
+                        "attachmentId": attachment_id,
+                        "partId": part_id
+                    }
+                    attachments[part_id] = attachment
+        else:
+            # Handle case when there are no parts (single part message)
+            logger.info(f"Email {message.get('id')} does not have 'parts' in payload (likely single part message)")
+            if "payload" in message and "body" in message["payload"] and "attachmentId" in message["payload"]["body"]:
+                # Handle potential attachment in single part message
+                attachment_id = message["payload"]["body"]["attachmentId"]
+                attachment = {
+                    "filename": message["payload"].get("filename", "attachment"),
+                    "mimeType": message["payload"].get("mimeType", "application/octet-stream"),
+                    "attachmentId": attachment_id,
+                    "partId": "0"
+                }
+                attachments["0"] = attachment
+
+        return parsed_email, attachments
+
     def get_email_by_id_with_attachments(self, email_id: str) -> Tuple[dict, dict] | Tuple[None, dict]:
         """
         Fetch and parse a complete email message by its ID including attachment IDs.
@@ -189,47 +264,113 @@ class GmailService():
                 id=email_id
             ).execute()
             
-            # Parse the message with body included
-            parsed_email = self._parse_message(txt=message, parse_body=True)
-
-            if parsed_email is None:
-                return None, {}
-
-            attachments = {}
-            # Check if 'parts' exists in payload before trying to access it
-            if "payload" in message and "parts" in message["payload"]:
-                for part in message["payload"]["parts"]:
-                    if "body" in part and "attachmentId" in part["body"]:
-                        attachment_id = part["body"]["attachmentId"]
-                        part_id = part["partId"]
-                        attachment = {
-                            "filename": part["filename"],
-                            "mimeType": part["mimeType"],
-                            "attachmentId": attachment_id,
-                            "partId": part_id
-                        }
-                        attachments[part_id] = attachment
-            else:
-                # Handle case when there are no parts (single part message)
-                logger.info(f"Email {email_id} does not have 'parts' in payload (likely single part message)")
-                if "payload" in message and "body" in message["payload"] and "attachmentId" in message["payload"]["body"]:
-                    # Handle potential attachment in single part message
-                    attachment_id = message["payload"]["body"]["attachmentId"]
-                    attachment = {
-                        "filename": message["payload"].get("filename", "attachment"),
-                        "mimeType": message["payload"].get("mimeType", "application/octet-stream"),
-                        "attachmentId": attachment_id,
-                        "partId": "0"
-                    }
-                    attachments["0"] = attachment
-
+            parsed_email, attachments = self._parse_message_with_attachments(message)
+            if parsed_email is not None:
+                self._remember_attachments(email_id, attachments)
             return parsed_email, attachments
             
         except Exception as e:
             logger.error(f"Error retrieving email {email_id}: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return None, {}
         
+    def _execute_batch(self, requests: list, callback) -> None:
+        """
+        Execute API requests as batched HTTP calls of at most BATCH_SIZE requests each.
+        When there is more than one batch, they are sent on a shared pool that keeps at most
+        MAX_CONCURRENT_BATCHES in flight.
+
+        Args:
+            requests (list): Unexecuted googleapiclient HttpRequest objects
+            callback: Called as callback(request_id, response, exception) for every request,
+                      where request_id is the request's index in `requests` as a string.
+                      May be called from several threads at once.
+        """
+        def execute_chunk(start: int) -> None:
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, request in enumerate(requests[start:start + BATCH_SIZE], start):
+                batch.add(request, request_id=str(index))
+            try:
+                # httplib2.Http is not thread-safe, so send the batch on this thread's own connection
+                batch.execute(http=gauth.get_authorized_http(self.user_id, self.credentials))
+            except Exception as e:
+                logger.error(f"Error executing batch request: {str(e)}")
+                logger.error(traceback.format_exc())
+                invalidate_on_unauthorized(self.user_id, e)
+
+        starts = range(0, len(requests), BATCH_SIZE)
+        if len(starts) <= 1:
+            for start in starts:
+                execute_chunk(start)
+            return
+        list(_batch_executor.map(execute_chunk, starts))
+
+    def get_emails_by_ids_with_attachments(self, email_ids: list[str]) -> list[Tuple[dict, dict] | Tuple[None, dict]]:
+        """
+        Fetch and parse multiple complete email messages using batched API requests.
+        
+        Args:
+            email_ids (list[str]): The Gmail message IDs to retrieve
+        
+        Returns:
+            list: One (parsed email, attachments) tuple per requested ID, in the same order.
+                  Messages that could not be retrieved yield (None, {}).
+        """
+        results: list[Tuple[dict, dict] | Tuple[None, dict]] = [(None, {}) for _ in email_ids]
+
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                logger.error(f"Error retrieving email {email_ids[index]}: {str(exception)}")
+                invalidate_on_unauthorized(self.user_id, exception)
+                return
+            try:
+                results[index] = self._parse_message_with_attachments(response)
+                if results[index][0] is not None:
+                    self._remember_attachments(email_ids[index], results[index][1])
+            except Exception as e:
+                logger.error(f"Error parsing email {email_ids[index]}: {str(e)}")
+                logger.error(traceback.format_exc())
+
+        requests = [
+            self.service.users().messages().get(userId='me', id=email_id)
+            for email_id in email_ids
+        ]
+        self._execute_batch(requests, on_response)
+        return results
+        
+    def _remember_attachments(self, message_id: str, attachments: dict) -> None:
+        with self._attachment_maps_lock:
+            self._attachment_maps[message_id] = attachments
+            self._attachment_maps.move_to_end(message_id)
+            while len(self._attachment_maps) > ATTACHMENT_MAP_CACHE_SIZE:
+                self._attachment_maps.popitem(last=False)
+
+    def get_attachment_maps(self, message_ids: list[str]) -> list[dict | None]:
+        """
+        Look up the attachments of several messages, fetching only messages not seen recently.
+
+        Args:
+            message_ids (list[str]): The Gmail message IDs to look up
+
+        Returns:
+            list: One dict of attachments keyed by part ID per requested ID, in the same order.
+                  Messages that could not be retrieved yield None.
+        """
+        maps: dict[str, dict | None] = {}
+        with self._attachment_maps_lock:
+            for message_id in message_ids:
+                if message_id in self._attachment_maps:
+                    self._attachment_maps.move_to_end(message_id)
+                    maps[message_id] = self._attachment_maps[message_id]
+
+        missing = [message_id for message_id in dict.fromkeys(message_ids) if message_id not in maps]
+        for message_id, (email, attachments) in zip(missing, self.get_emails_by_ids_with_attachments(missing)):
+            maps[message_id] = attachments if email is not None else None
+
+        return [maps[message_id] for message_id in message_ids]
+
     def create_draft(self, to: str, subject: str, body: str, cc: list[str] | None = None) -> dict | None:
         """
         Create a draft email message.
@@ -279,6 +420,7 @@ class GmailService():
         except Exception as e:
             logger.error(f"Error creating draft: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return None
         
     def delete_draft(self, draft_id: str) -> bool:
@@ -301,6 +443,7 @@ class GmailService():
         except Exception as e:
             logger.error(f"Error deleting draft {draft_id}: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return False
         
     def create_reply(self, original_message: dict, reply_body: str, send: bool = False, cc: list[str] | None = None) -> dict | None:
@@ -373,6 +516,7 @@ class GmailService():
         except Exception as e:
             logger.error(f"Error {'sending' if send else 'drafting'} reply: {str(e)}")
             logger.error(traceback.format_exc())
+            invalidate_on_unauthorized(self.user_id, e)
             return None
         
     def get_attachment(self, message_id: str, attachment_id: str) -> dict | None:
@@ -401,4 +545,51 @@ class GmailService():
         except Exception as e:
             logger.error(f"Error retrieving attachment {attachment_id} from message {message_id}: {str(e)}")
             logger.error(traceback.format_exc())
-            return None
\ No newline at end of file
+            invalidate_on_unauthorized(self.user_id, e)
+            return None
+
+    def get_attachments(self, attachment_refs: list[Tuple[str, str]]) -> list[dict | None]:
+        """
+        Retrieves multiple Gmail attachments using batched API requests.
+        
+        Args:
+            attachment_refs (list[Tuple[str, str]]): (message_id, attachment_id) pairs to retrieve
+        
+        Returns:
+            list: Attachment data (as returned by get_attachment) per requested pair, in the same order.
+                  Attachments that could not be retrieved yield None.
+        """
+        results: list[dict | None] = [None for _ in attachment_refs]
+
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                message_id, attachment_id = attachment_refs[index]
+                logger.error(f"Error retrieving attachment {attachment_id} from message {message_id}: {str(exception)}")
+                invalidate_on_unauthorized(self.user_id, exception)
+                return
+            results[index] = {
+                "size": response.get("size"),
+                "data": response.get("data")
+            }
+
+        requests = [
+            self.service.users().messages().attachments().get(
+                userId='me',
+                messageId=message_id,
+                id=attachment_id
+            )
+            for message_id, attachment_id in attachment_refs
+        ]
+        self._execute_batch(requests, on_response)
+        return results
+
+
+@functools.lru_cache(maxsize=8)
+def get_gmail_service(user_id: str) -> GmailService:
+    """Returns a GmailService for user_id, reusing the built discovery client across tool calls."""
+    return GmailService(user_id=user_id)
+
+
+# the cached client keeps using the credentials it was built with, so drop it once they are rejected
+on_unauthorized(get_gmail_service.cache_clear)
@@ -1,14 +1,55 @@
-import subprocess
-import sys
+import asyncio
+import datetime
+import inspect
 import threading
+import time
+import webbrowser
 from functools import wraps
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import parse_qs, urlparse
 
+from googleapiclient.errors import HttpError
+
 USER_ID_ARG = "__user_id__"
 from . import gauth
 from .logs import logger
 
+# Credentials are considered stale this many seconds before their actual expiry.
+TOKEN_EXPIRY_MARGIN = 300
+# Upper bound on how long a verified credential is trusted without re-checking it.
+MAX_OAUTH_TOKEN_CACHE_TTL = 600
+# Seconds a browser OAuth flow may take before it is abandoned.
+AUTH_FLOW_TIMEOUT = 300
+
+# user_id -> (monotonic deadline, verified credentials)
+_auth_cache: dict[str, tuple[float, gauth.OAuth2Credentials]] = {}
+_auth_cache_lock = threading.Lock()
+
+# accounts file contents, loaded on first use; changing accounts requires a restart
+_accounts_cache: list[gauth.AccountInfo] | None = None
+_valid_emails: frozenset[str] = frozenset()
+
+# user_id -> lock serializing credential refreshes, so concurrent tool calls refresh once
+_user_locks: dict[str, threading.Lock] = {}
+_user_locks_lock = threading.Lock()
+
+# called with no arguments whenever a 401 invalidates cached credentials, so
+# API clients built on the rejected credentials get rebuilt too
+_unauthorized_hooks: list = []
+
+
+class _AuthFlow:
+    """A running browser OAuth flow; done is set once it finishes, error records why it failed."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Exception | None = None
+
+
+# user_id -> the running browser OAuth flow for that user
+_auth_in_progress: dict[str, _AuthFlow] = {}
+_auth_in_progress_lock = threading.Lock()
+
 
 class OauthListener(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -24,54 +65,203 @@ class OauthListener(BaseHTTPRequestHandler):
             self.end_headers()
             return
 
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write("Auth successful! You can close the tab!".encode("utf-8"))
-        self.wfile.flush()
-
         storage = {}
-        creds = gauth.get_credentials(authorization_code=query["code"][0], state=storage)
+        try:
+            gauth.get_credentials(
+                authorization_code=query["code"][0], state=storage, redirect_uri=self.server.redirect_uri
+            )
+        except Exception as e:
+            logger.error(f"Error completing OAuth flow: {e}")
+            self.server.auth_error = e
+        finally:
+            # stop listening whatever the outcome, so the flow never waits for another callback
+            self.server.auth_completed = True
 
-        t = threading.Thread(target=self.server.shutdown)
-        t.daemon = True
-        t.start()
+        if self.server.auth_error is None:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write("Auth successful! You can close the tab!".encode("utf-8"))
+        else:
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write("Auth failed! Check the server logs for details.".encode("utf-8"))
+        self.wfile.flush()
 
 
 def start_auth_flow(user_id: str):
-    auth_url = gauth.get_authorization_url(user_id, state={})
-    if sys.platform == "darwin" or sys.platform.startswith("linux"):
-        subprocess.Popen(["open", auth_url])
-    else:
-        import webbrowser
+    """Runs the browser OAuth flow for user_id.
+
+    If a flow for user_id is already running, waits for it to finish instead of
+    opening a second browser tab and callback listener.
+    """
+    with _auth_in_progress_lock:
+        flow = _auth_in_progress.get(user_id)
+        if flow is None:
+            flow = _auth_in_progress[user_id] = _AuthFlow()
+            owner = True
+        else:
+            owner = False
+    if not owner:
+        logger.info(f"OAuth flow for {user_id} already in progress, waiting for it to finish")
+        if not flow.done.wait(timeout=AUTH_FLOW_TIMEOUT):
+            raise RuntimeError(f"Timed out waiting for the OAuth flow for {user_id}")
+        if flow.error is not None:
+            raise RuntimeError(f"OAuth flow for {user_id} failed: {flow.error}") from flow.error
+        return
+
+    try:
+        _run_auth_flow(user_id)
+    except Exception as e:
+        flow.error = e
+        raise
+    finally:
+        with _auth_in_progress_lock:
+            del _auth_in_progress[user_id]
+        flow.done.set()
+
+
+def _run_auth_flow(user_id: str):
+    # unless the client needs its registered port, listen on an ephemeral loopback port
+    # so repeated flows never collide
+    server = HTTPServer(("127.0.0.1", gauth.get_oauth_callback_port()), OauthListener)
+    server.redirect_uri = f"http://localhost:{server.server_address[1]}/code"
+    server.auth_completed = False
+    server.auth_error = None
+
+    auth_url = gauth.get_authorization_url(user_id, state={}, redirect_uri=server.redirect_uri)
+    webbrowser.open(auth_url, new=2)
+
+    # handle callback requests one at a time until the code arrives or the flow times out
+    deadline = time.monotonic() + AUTH_FLOW_TIMEOUT
+    try:
+        while not server.auth_completed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"OAuth flow for {user_id} timed out after {AUTH_FLOW_TIMEOUT} seconds")
+            server.timeout = remaining
+            server.handle_request()
+    finally:
+        server.server_close()
+    if server.auth_error is not None:
+        raise RuntimeError(f"OAuth flow for {user_id} failed: {server.auth_error}") from server.auth_error
+
 
-        webbrowser.open(auth_url)
+def get_cached_credentials(user_id: str) -> gauth.OAuth2Credentials | None:
+    """Returns the verified credentials for user_id if they are still fresh, None otherwise."""
+    with _auth_cache_lock:
+        entry = _auth_cache.get(user_id)
+    if entry is None:
+        return None
+    deadline, credentials = entry
+    if deadline - time.monotonic() <= 0:
+        return None
+    return credentials
 
-    # start server for code callback
-    server_address = ("", 4100)
-    server = HTTPServer(server_address, OauthListener)
-    server.serve_forever()
+
+def get_user_credentials(user_id: str) -> gauth.OAuth2Credentials | None:
+    """Returns the credentials setup_oauth2 keeps verified and refreshed for user_id.
+
+    The in-memory credentials are returned even once their cache entry has gone stale,
+    since setup_oauth2 refreshes that same object in place; they are only read from disk
+    when none are loaded yet. API clients built from these share one credentials object,
+    and so one refresh path, with setup_oauth2.
+    """
+    with _auth_cache_lock:
+        entry = _auth_cache.get(user_id)
+    if entry is not None:
+        return entry[1]
+    return gauth.get_stored_credentials(user_id=user_id)
+
+
+def _seconds_until_expiry(credentials: gauth.OAuth2Credentials) -> float | None:
+    """Returns how long the access token stays valid, or None if its expiry is unknown."""
+    if credentials.token_expiry is None:
+        return None
+    # oauth2client stores token_expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return (credentials.token_expiry - now).total_seconds()
+
+
+def cache_credentials(user_id: str, credentials: gauth.OAuth2Credentials):
+    """Remembers verified credentials until shortly before their access token expires."""
+    ttl = MAX_OAUTH_TOKEN_CACHE_TTL
+    remaining = _seconds_until_expiry(credentials)
+    if remaining is not None:
+        ttl = min(ttl, remaining - TOKEN_EXPIRY_MARGIN)
+    if ttl <= 0:
+        return
+    with _auth_cache_lock:
+        _auth_cache[user_id] = (time.monotonic() + ttl, credentials)
+
+
+def invalidate_auth_cache(user_id: str):
+    """Drops any cached credentials for user_id so the next call re-verifies them."""
+    with _auth_cache_lock:
+        _auth_cache.pop(user_id, None)
+
+
+def on_unauthorized(hook):
+    """Registers hook to be called whenever a 401 invalidates cached credentials."""
+    _unauthorized_hooks.append(hook)
+    return hook
+
+
+def invalidate_on_unauthorized(user_id: str, error: Exception):
+    """Invalidates the cached credentials for user_id if error is an HTTP 401 from Google."""
+    if isinstance(error, HttpError) and error.resp.status == 401:
+        logger.warning(f"Received 401 for {user_id}, invalidating cached credentials")
+        invalidate_auth_cache(user_id)
+        for hook in _unauthorized_hooks:
+            hook()
+
+
+def _get_user_lock(user_id: str) -> threading.Lock:
+    with _user_locks_lock:
+        return _user_locks.setdefault(user_id, threading.Lock())
+
+
+def get_accounts() -> list[gauth.AccountInfo]:
+    """Returns the configured accounts, reading the accounts file only once per process."""
+    global _accounts_cache, _valid_emails
+    if _accounts_cache is None:
+        accounts = gauth.get_account_info()
+        _valid_emails = frozenset(a.email for a in accounts)
+        _accounts_cache = accounts
+    return _accounts_cache
 
 
 def setup_oauth2(user_id: str):
-    accounts = gauth.get_account_info()
+    if get_cached_credentials(user_id) is not None:
+        return
+
+    accounts = get_accounts()
     if len(accounts) == 0:
         raise RuntimeError("No accounts specified in .gauth.json")
-    if user_id not in [a.email for a in accounts]:
+    if user_id not in _valid_emails:
         raise RuntimeError(f"Account for email: {user_id} not specified in .gauth.json")
 
-    credentials = gauth.get_stored_credentials(user_id=user_id)
-    if not credentials:
-        start_auth_flow(user_id=user_id)
-    else:
-        if credentials.access_token_expired:
-            credentials.refresh(gauth.httplib2.Http())
+    with _get_user_lock(user_id):
+        # another call for the same user may have refreshed while we waited
+        if get_cached_credentials(user_id) is not None:
+            return
+
+        # re-verify the in-memory credentials once their cache entry went stale; only read
+        # them from disk again if the entry was never populated or explicitly invalidated
+        credentials = get_user_credentials(user_id)
+        if credentials:
+            # only talk to Google when the access token is expired or about to expire
+            remaining = _seconds_until_expiry(credentials)
+            if credentials.access_token_expired or (remaining is not None and remaining < TOKEN_EXPIRY_MARGIN):
+                credentials.refresh(gauth.httplib2.Http())
+                gauth.store_credentials(credentials=credentials, user_id=user_id)
+            cache_credentials(user_id=user_id, credentials=credentials)
+            return
 
-        # this call refreshes access token
-        gauth.get_user_info(credentials=credentials)
-        gauth.store_credentials(credentials=credentials, user_id=user_id)
+    start_auth_flow(user_id=user_id)
 
 
-def require_auth(id: str):
+def check_auth(id: str) -> str | None:
+    """Sets up credentials for id, returning an error message if that fails."""
     if not id:
         raise RuntimeError(f"Missing required argument: {USER_ID_ARG}")
     try:
@@ -79,3 +269,31 @@ def require_auth(id: str):
         setup_oauth2(user_id=id)
     except Exception as e:
         return f"setup_oauth2 error: {str(e)}"
+    return None
+
+
+def require_auth(tool):
+    """Decorates a tool so it only runs once credentials for its __user_id__ are set up.
+
+    If authentication fails, the tool returns the error message instead of running.
+    Coroutine tools run the (blocking) credential check in a worker thread.
+    """
+    def get_user_id(args, kwargs):
+        return kwargs[USER_ID_ARG] if USER_ID_ARG in kwargs else (args[0] if args else None)
+
+    if inspect.iscoroutinefunction(tool):
+        @wraps(tool)
+        async def async_wrapper(*args, **kwargs):
+            error = await asyncio.to_thread(check_auth, get_user_id(args, kwargs))
+            if error is not None:
+                return error
+            return await tool(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(tool)
+    def wrapper(*args, **kwargs):
+        error = check_auth(get_user_id(args, kwargs))
+        if error is not None:
+            return error
+        return tool(*args, **kwargs)
+    return wrapper
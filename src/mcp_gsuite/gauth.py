@@ -5,12 +5,21 @@ from oauth2client.client import (
     Credentials,
 )
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from googleapiclient.model import JsonModel
 import httplib2
-from google.auth.transport.requests import Request
 import os
 import pydantic
 import json
 import argparse
+import threading
+from urllib.parse import urlparse
+
+try:
+    # considerably faster parser for large API responses, used when installed
+    import orjson
+except ImportError:
+    orjson = None
 
 from .logs import logger
 
@@ -24,6 +33,8 @@ if load_dotenv():
 GAUTH_FILE_PATH = os.getenv("GAUTH_FILE_PATH", "./.gauth.json")
 ACCOUNTS_FILE_PATH = os.getenv("ACCOUNTS_FILE_PATH", "./.accounts.json")
 CREDENTIALS_DIR_PATH = os.getenv("CREDENTIALS_DIR_PATH", ".")
+# port for the OAuth callback listener; when unset, see get_oauth_callback_port
+OAUTH_CALLBACK_PORT = os.getenv("OAUTH_CALLBACK_PORT")
 
 
 
@@ -41,7 +52,27 @@ def get_gauth_file() -> str:
 
 CLIENTSECRETS_LOCATION = get_gauth_file()
 
-REDIRECT_URI = 'http://localhost:4100/code'
+def get_oauth_callback_port() -> int:
+    """Returns the port the OAuth callback listener should bind to.
+
+    OAUTH_CALLBACK_PORT wins when set. Otherwise a "web" client only accepts the
+    redirect URIs registered for it, so the port of its first localhost redirect URI
+    is used; any other client accepts every loopback port, so 0 lets the OS pick one.
+    """
+    if OAUTH_CALLBACK_PORT:
+        return int(OAUTH_CALLBACK_PORT)
+    try:
+        with open(CLIENTSECRETS_LOCATION) as f:
+            client_secrets = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    for redirect_uri in client_secrets.get("web", {}).get("redirect_uris", []):
+        parsed = urlparse(redirect_uri)
+        if parsed.hostname in ("localhost", "127.0.0.1") and parsed.port:
+            return parsed.port
+    return 0
+
+
 SCOPES = [
     "openid",
     "https://www.googleapis.com/auth/userinfo.email",
@@ -162,19 +193,61 @@ def store_credentials(credentials: OAuth2Credentials, user_id: str):
         f.write(data)
 
 
-def exchange_code(authorization_code):
+_http_local = threading.local()
+
+
+def get_authorized_http(user_id: str, credentials: OAuth2Credentials) -> httplib2.Http:
+    """Return the calling thread's authorized httplib2.Http for the provided user ID.
+
+    httplib2.Http is not thread-safe, so every thread keeps its own instance per user
+    and reuses its open connections across all Google API calls made for that user.
+    """
+    http_by_user = getattr(_http_local, "http_by_user", None)
+    if http_by_user is None:
+        http_by_user = _http_local.http_by_user = {}
+    entry = http_by_user.get(user_id)
+    if entry is None or entry[0] is not credentials:
+        entry = http_by_user[user_id] = (credentials, credentials.authorize(httplib2.Http()))
+    return entry[1]
+
+
+class OrjsonModel(JsonModel):
+    """JsonModel that parses response bodies with orjson, straight from the raw bytes."""
+
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and "data" in body:
+            body = body["data"]
+        return body
+
+
+def build_service(service_name: str, version: str, user_id: str, credentials: OAuth2Credentials):
+    """Build a Google API client whose requests run on get_authorized_http for the user."""
+    def request_builder(http, *args, **kwargs):
+        return HttpRequest(get_authorized_http(user_id, credentials), *args, **kwargs)
+
+    # neither Gmail nor Calendar use the dataWrapper feature, matching build()'s default model
+    model = OrjsonModel(data_wrapper=False) if orjson is not None else None
+    return build(service_name, version, credentials=credentials, requestBuilder=request_builder, model=model)
+
+
+def exchange_code(authorization_code, redirect_uri):
     """Exchange an authorization code for OAuth 2.0 credentials.
 
     Args:
     authorization_code: Authorization code to exchange for OAuth 2.0
                         credentials.
+    redirect_uri: Redirect URI the authorization code was issued for.
     Returns:
     oauth2client.client.OAuth2Credentials instance.
     Raises:
     CodeExchangeException: an error occurred.
     """
     flow = flow_from_clientsecrets(CLIENTSECRETS_LOCATION, ' '.join(SCOPES))
-    flow.redirect_uri = REDIRECT_URI
+    flow.redirect_uri = redirect_uri
     try:
         credentials = flow.step2_exchange(authorization_code)
         return credentials
@@ -206,16 +279,17 @@ def get_user_info(credentials):
         raise NoUserIdException()
 
 
-def get_authorization_url(email_address, state):
+def get_authorization_url(email_address, state, redirect_uri):
     """Retrieve the authorization URL.
 
     Args:
     email_address: User's e-mail address.
     state: State for the authorization URL.
+    redirect_uri: URI Google redirects to with the authorization code.
     Returns:
     Authorization URL to redirect the user to.
     """
-    flow = flow_from_clientsecrets(CLIENTSECRETS_LOCATION, ' '.join(SCOPES), redirect_uri=REDIRECT_URI)
+    flow = flow_from_clientsecrets(CLIENTSECRETS_LOCATION, ' '.join(SCOPES), redirect_uri=redirect_uri)
     flow.params['access_type'] = 'offline'
     flow.params['approval_prompt'] = 'force'
     flow.params['user_id'] = email_address
@@ -223,7 +297,7 @@ def get_authorization_url(email_address, state):
     return str(flow.step1_get_authorize_url(state=state))
 
 
-def get_credentials(authorization_code, state):
+def get_credentials(authorization_code, state, redirect_uri):
     """Retrieve credentials using the provided authorization code.
 
     This function exchanges the authorization code for an access token and queries
@@ -237,6 +311,7 @@ def get_credentials(authorization_code, state):
     Args:
     authorization_code: Authorization code to use to retrieve an access token.
     state: State to set to the authorization URL in case of error.
+    redirect_uri: Redirect URI the authorization code was issued for.
     Returns:
     oauth2client.client.OAuth2Credentials instance containing an access and
     refresh token.
@@ -247,7 +322,7 @@ def get_credentials(authorization_code, state):
     """
     email_address = ''
     try:
-        credentials = exchange_code(authorization_code)
+        credentials = exchange_code(authorization_code, redirect_uri=redirect_uri)
         user_info = get_user_info(credentials)
         import json
         logger.error(f"user_info: {json.dumps(user_info)}")
@@ -265,11 +340,11 @@ def get_credentials(authorization_code, state):
         # Drive apps should try to retrieve the user and credentials for the current
         # session.
         # If none is available, redirect the user to the authorization URL.
-        error.authorization_url = get_authorization_url(email_address, state)
+        error.authorization_url = get_authorization_url(email_address, state, redirect_uri=redirect_uri)
         raise error
     except NoUserIdException:
         logger.error('No user ID could be retrieved.')
         # No refresh token has been retrieved.
-    authorization_url = get_authorization_url(email_address, state)
+    authorization_url = get_authorization_url(email_address, state, redirect_uri=redirect_uri)
     raise NoRefreshTokenException(authorization_url)
 
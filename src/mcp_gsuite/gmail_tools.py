@@ -1,267 +1,371 @@
 """MCP Tool definitions for Gmail API."""
 from fastmcp.server import FastMCP
-from pydantic import Field, AnyUrl
-from typing import Annotated
-import base64
-import json
+from pydantic import Field
+from typing import Annotated, Iterator
+import asyncio
+import binascii
+import os
+import secrets
+try:
+    # SIMD base64 decoder, used when installed
+    import pybase64
+except ImportError:
+    pybase64 = None
 from mcp.types import (
     TextContent,
     EmbeddedResource,
     BlobResourceContents,
 )
-from . import gauth
 from .api import gmail
 from .logs import logger
-from .auth_utils import require_auth
+from ._json_utils import to_json
+from .auth_utils import get_accounts, require_auth
 
 # Dynamically load user IDs from accounts.json
 try:
-    accounts = gauth.get_account_info()
+    accounts = get_accounts()
     user_id_examples_formatted = [f"{account.email} ({account.account_type}, {account.extra_info})" for account in accounts]
     user_id_examples = [f"{account.email} ({account.account_type}, {account.extra_info})" for account in accounts]
 except Exception as e:
     print(f"Warning: Could not load accounts from .accounts.json: {e}. Using default examples.")
     user_id_examples = ["your.name@example.com"] # Fallback if accounts.json is not found or invalid
+    user_id_examples_formatted = user_id_examples
 
-def decode_base64_data(file_data):
-    standard_base64_data = file_data.replace("-", "+").replace("_", "/")
-    missing_padding = len(standard_base64_data) % 4
-    if missing_padding:
-        standard_base64_data += "=" * (4 - missing_padding)
-    return base64.b64decode(standard_base64_data, validate=True)
+_USER_ID_DESC = f"The email of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}"
 
-def register_gmail_tools(mcp: FastMCP):
-    @mcp.tool(name="query_gmail_emails")
-    def query_gmail_emails(
-        __user_id__: Annotated[str, Field(description=f"The email of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        query: Annotated[str | None, Field(description="Gmail search query (optional).", examples=["in:inbox subject:test"])] = None,
-        max_results: Annotated[int, Field(description="Maximum number of emails to retrieve (1-500)", examples=[10], ge=1, le=500)] = 10
-    ) -> str:
-        """Query Gmail emails based on an optional search query.
-        Returns emails in reverse chronological order (newest first).
-        Returns metadata such as subject and also a short summary of the content.
-        """
-        require_auth(__user_id__)
-        try:
-            gmail_service = gmail.GmailService(user_id=__user_id__)
-        except Exception as e:
-            return f"Error initializing GmailService: {str(e)}"
+UserId = Annotated[str, Field(description=_USER_ID_DESC, examples=user_id_examples)]
 
-        try:
-            emails = gmail_service.query_emails(query=query, max_results=max_results)
-        except Exception as e:
-            return f"Error querying emails: {str(e)}"
+# Maps Gmail's URL-safe base64 alphabet onto the standard one in a single bytes.translate pass
+_B64_URLSAFE_TO_STD = bytes.maketrans(b"-_", b"+/")
 
+def decode_base64_data(file_data):
+    # Gmail returns URL-safe base64 without padding; both decoders get the same standard-alphabet
+    # input and strict validation, so a malformed attachment fails the same way on either
+    data = (file_data + "=" * (-len(file_data) & 3)).encode("ascii").translate(_B64_URLSAFE_TO_STD)
+    if pybase64 is not None:
+        return pybase64.b64decode(data, validate=True)
+    # binascii is the C decoder behind base64.b64decode, minus its per-call argument handling
+    return binascii.a2b_base64(data, strict_mode=True)
+
+# Base64 characters decoded per chunk; a multiple of 4 so every chunk but the last is unpadded
+DECODE_CHUNK_SIZE = 64 * 1024
+
+def iter_decoded_base64(file_data: str, chunk_size: int = DECODE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Decodes Gmail's URL-safe base64 lazily, yielding at most chunk_size * 3/4 bytes at a time."""
+    if chunk_size % 4:
+        raise ValueError("chunk_size must be a multiple of 4")
+    for start in range(0, len(file_data), chunk_size):
+        yield decode_base64_data(file_data[start:start + chunk_size])
+
+# Largest decoded attachment that will be written to disk; Gmail caps whole messages at 50 MB
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(50 * 1024 * 1024)))
+
+class AttachmentTooLargeError(ValueError):
+    pass
+
+# Attachments decoded and written to disk at the same time by bulk_save_gmail_attachments
+MAX_CONCURRENT_SAVES = 8
+
+def _ensure_parent_dirs(save_paths):
+    # create each target directory once up front; if that fails, writing the file reports the error
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in save_paths}:
         try:
-            return json.dumps(emails, indent=2)
-        except Exception as e:
-            return f"Error parsing emails: {str(e)}"
-
-
-    @mcp.tool(name="get_gmail_email")
-    def get_gmail_email(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        email_id: Annotated[str, Field(description="The ID of the Gmail message to retrieve")]
-    ) -> str:
-        """Retrieves a complete Gmail email message by its ID, including the full message body and attachment IDs."""
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-        email, attachments = gmail_service.get_email_by_id_with_attachments(email_id)
-
-        if email is None:
-            return f"Failed to retrieve email with ID: {email_id}"
-
-        email["attachments"] = attachments
-        return json.dumps(email, indent=2)
-
-
-    @mcp.tool(name="create_gmail_draft")
-    def create_gmail_draft(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        to: Annotated[str, Field(description="Email address of the recipient")],
-        subject: Annotated[str, Field(description="Subject line of the email")],
-        body: Annotated[str, Field(description="Body content of the email")],
-        cc: Annotated[list[str] | None, Field(description="Optional list of email addresses to CC")] = None
-    ) -> str:
-        """Creates a draft email message from scratch in Gmail with specified recipient, subject, body, and optional CC recipients.
-
-        Do NOT use this tool when you want to draft or send a REPLY to an existing message. This tool does NOT include any previous message content. Use the reply_gmail_email tool
-        with send=False instead."
-        """
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-        draft = gmail_service.create_draft(to=to, subject=subject, body=body, cc=cc)
-
-        if draft is None:
-            return "Failed to create draft email"
-
-        return json.dumps(draft, indent=2)
-
-
-    @mcp.tool(name="delete_gmail_draft")
-    def delete_gmail_draft(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        draft_id: Annotated[str, Field(description="The ID of the draft to delete")]
-    ) -> str:
-        """Deletes a Gmail draft message by its ID. This action cannot be undone."""
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-        success = gmail_service.delete_draft(draft_id)
-
-        return (
-            "Successfully deleted draft"
-            if success
-            else f"Failed to delete draft with ID: {draft_id}"
-        )
-
-
-    @mcp.tool(name="reply_gmail_email")
-    def reply_gmail_email(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        original_message_id: Annotated[str, Field(description="The ID of the Gmail message to reply to")],
-        reply_body: Annotated[str, Field(description="The body content of your reply message")],
-        send: Annotated[bool, Field(description="If true, sends the reply immediately. If false, saves as draft.", default=False)],
-        cc: Annotated[list[str] | None, Field(description="Optional list of email addresses to CC on the reply")] = None,
-    ) -> str:
-        """Creates a reply to an existing Gmail email message and either sends it or saves as draft.
-
-        Use this tool if you want to draft a reply. Use the 'cc' argument if you want to perform a "reply all".
-        """
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-
-        # First get the original message to extract necessary information
-        original_message, _ = gmail_service.get_email_by_id_with_attachments(
-            original_message_id
-        )
-        if original_message is None:
-            return f"Failed to retrieve original message with ID: {original_message_id}"
-
-        # Create and send/draft the reply
-        result = gmail_service.create_reply(
-            original_message=original_message,
-            reply_body=reply_body,
-            send=send,
-            cc=cc,
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not create directory {directory}: {e}")
+
+def _decode_and_write(file_data: str, save_path: str):
+    # base64 carries 3 bytes per 4 characters, so this bounds the decoded size before touching the disk
+    if len(file_data) // 4 * 3 > MAX_ATTACHMENT_BYTES:
+        raise AttachmentTooLargeError(
+            f"Attachment of about {len(file_data) // 4 * 3} bytes exceeds MAX_ATTACHMENT_BYTES ({MAX_ATTACHMENT_BYTES})"
         )
+    # decode into a temp file next to the target and move it into place once complete, so a failed
+    # save never truncates or deletes an existing file; O_EXCL never reuses an existing path, and
+    # 0o666 leaves the final permissions to the umask like a plain open() would
+    temp_path = f"{save_path}.{secrets.token_hex(4)}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        # decode chunk by chunk straight into the file, so the decoded attachment is never fully in memory;
+        # unbuffered, since every chunk is written whole and would only be copied through a buffer
+        with open(fd, "wb", buffering=0) as f:
+            for decoded in iter_decoded_base64(file_data):
+                chunk = memoryview(decoded)
+                # raw writes may be partial
+                while chunk:
+                    chunk = chunk[f.write(chunk):]
+        os.replace(temp_path, save_path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+@require_auth
+def query_gmail_emails(
+    __user_id__: UserId,
+    query: Annotated[str | None, Field(description="Gmail search query (optional).", examples=["in:inbox subject:test"])] = None,
+    max_results: Annotated[int, Field(description="Maximum number of emails to retrieve (1-500)", examples=[10], ge=1, le=500)] = 10
+) -> str:
+    """Query Gmail emails based on an optional search query.
+    Returns emails in reverse chronological order (newest first).
+    Returns metadata such as subject and also a short summary of the content.
+    """
+    try:
+        gmail_service = gmail.get_gmail_service(__user_id__)
+    except Exception as e:
+        return f"Error initializing GmailService: {str(e)}"
+
+    try:
+        emails = gmail_service.query_emails(query=query, max_results=max_results)
+    except Exception as e:
+        return f"Error querying emails: {str(e)}"
+
+    try:
+        return to_json(emails)
+    except Exception as e:
+        return f"Error parsing emails: {str(e)}"
+
+
+@require_auth
+def get_gmail_email(
+    __user_id__: UserId,
+    email_id: Annotated[str, Field(description="The ID of the Gmail message to retrieve")]
+) -> str:
+    """Retrieves a complete Gmail email message by its ID, including the full message body and attachment IDs."""
+    gmail_service = gmail.get_gmail_service(__user_id__)
+    email, attachments = gmail_service.get_email_by_id_with_attachments(email_id)
+
+    if email is None:
+        return f"Failed to retrieve email with ID: {email_id}"
+
+    email["attachments"] = attachments
+    return to_json(email)
+
+
+@require_auth
+def create_gmail_draft(
+    __user_id__: UserId,
+    to: Annotated[str, Field(description="Email address of the recipient")],
+    subject: Annotated[str, Field(description="Subject line of the email")],
+    body: Annotated[str, Field(description="Body content of the email")],
+    cc: Annotated[list[str] | None, Field(description="Optional list of email addresses to CC")] = None
+) -> str:
+    """Creates a draft email message from scratch in Gmail with specified recipient, subject, body, and optional CC recipients.
+
+    Do NOT use this tool when you want to draft or send a REPLY to an existing message. This tool does NOT include any previous message content. Use the reply_gmail_email tool
+    with send=False instead."
+    """
+    gmail_service = gmail.get_gmail_service(__user_id__)
+    draft = gmail_service.create_draft(to=to, subject=subject, body=body, cc=cc)
+
+    if draft is None:
+        return "Failed to create draft email"
+
+    return to_json(draft)
+
+
+@require_auth
+def delete_gmail_draft(
+    __user_id__: UserId,
+    draft_id: Annotated[str, Field(description="The ID of the draft to delete")]
+) -> str:
+    """Deletes a Gmail draft message by its ID. This action cannot be undone."""
+    gmail_service = gmail.get_gmail_service(__user_id__)
+    success = gmail_service.delete_draft(draft_id)
+
+    return (
+        "Successfully deleted draft"
+        if success
+        else f"Failed to delete draft with ID: {draft_id}"
+    )
+
+
+@require_auth
+def reply_gmail_email(
+    __user_id__: UserId,
+    original_message_id: Annotated[str, Field(description="The ID of the Gmail message to reply to")],
+    reply_body: Annotated[str, Field(description="The body content of your reply message")],
+    send: Annotated[bool, Field(description="If true, sends the reply immediately. If false, saves as draft.", default=False)],
+    cc: Annotated[list[str] | None, Field(description="Optional list of email addresses to CC on the reply")] = None,
+) -> str:
+    """Creates a reply to an existing Gmail email message and either sends it or saves as draft.
+
+    Use this tool if you want to draft a reply. Use the 'cc' argument if you want to perform a "reply all".
+    """
+    gmail_service = gmail.get_gmail_service(__user_id__)
+
+    # First get the original message to extract necessary information
+    original_message, _ = gmail_service.get_email_by_id_with_attachments(
+        original_message_id
+    )
+    if original_message is None:
+        return f"Failed to retrieve original message with ID: {original_message_id}"
+
+    # Create and send/draft the reply
+    result = gmail_service.create_reply(
+        original_message=original_message,
+        reply_body=reply_body,
+        send=send,
+        cc=cc,
+    )
+
+    if result is None:
+        return f"Failed to {'send' if send else 'draft'} reply email"
+
+    return to_json(result)
+
+
+@require_auth
+def get_gmail_attachment(
+    __user_id__: UserId,
+    message_id: Annotated[str, Field(description="The ID of the Gmail message containing the attachment")],
+    attachment_id: Annotated[str, Field(description="The ID of the attachment to retrieve")],
+    mime_type: Annotated[str, Field(description="The MIME type of the attachment")],
+    filename: Annotated[str, Field(description="The filename of the attachment")],
+    save_to_disk: Annotated[str | None, Field(description="The fullpath to save the attachment to disk. If not provided, the attachment is returned as a resource.")] = None,
+) -> str | EmbeddedResource:
+    """Retrieves a Gmail attachment by its ID."""
+    gmail_service = gmail.get_gmail_service(__user_id__)
+    attachment_data = gmail_service.get_attachment(message_id, attachment_id)
+
+    if attachment_data is None:
+        return f"Failed to retrieve attachment with ID: {attachment_id} from message: {message_id}"
+
+    file_data = attachment_data["data"]
+    if save_to_disk:
+        _ensure_parent_dirs([save_to_disk])
+        _decode_and_write(file_data, save_to_disk)
+        return f"Attachment saved to disk: {save_to_disk}"
+
+    # the blob is already base64, so hand Gmail's string through without decoding it
+    attachment_url = f"attachment://gmail/{message_id}/{attachment_id}/{filename}"
+    return EmbeddedResource(
+        type="resource",
+        resource=BlobResourceContents(
+            blob=file_data,
+            uri=attachment_url,
+            mimeType=mime_type,
+        ),
+    )
+
+
+@require_auth
+async def bulk_get_gmail_emails(
+    __user_id__: UserId,
+    email_ids: Annotated[list[str], Field(description="List of Gmail message IDs to retrieve")]
+) -> str:
+    """Retrieves multiple Gmail email messages by their IDs in a single request, including the full message bodies and attachment IDs."""
+    # The batch fetch blocks until every chunk is back, so keep it off the event loop
+    gmail_service = await asyncio.to_thread(gmail.get_gmail_service, __user_id__)
+
+    emails = await asyncio.to_thread(gmail_service.get_emails_by_ids_with_attachments, email_ids)
+
+    # Encode emails one at a time, dropping each parsed message once encoded,
+    # so the parsed messages and the encoded output are never both fully in memory
+    encoded = []
+    for index, (email, attachments) in enumerate(emails):
+        emails[index] = None
+        if email is not None:
+            email["attachments"] = attachments
+            encoded.append(to_json(email))
+
+    if not encoded:
+        return "Failed to retrieve any emails from the provided IDs"
+
+    return "[" + ",".join(encoded) + "]"
+
+
+@require_auth
+async def bulk_save_gmail_attachments(
+    __user_id__: UserId,
+    attachments: Annotated[list[dict], Field(description="A list of dictionaries, each containing 'message_id', 'save_path', and either 'attachment_id' or 'part_id' for attachments to save. Passing 'attachment_id' skips looking up the message.")]
+) -> list[TextContent] | str:
+    """Saves multiple Gmail attachments to disk by their message IDs and attachment IDs in a single request."""
+    # Gmail API calls are blocking, so keep them off the event loop
+    gmail_service = await asyncio.to_thread(gmail.get_gmail_service, __user_id__)
+    results = []
+
+    # Look up each message referenced only by part ID once, to resolve part IDs to attachment IDs;
+    # messages seen recently are answered from memory, the rest are fetched in one batch
+    message_ids = list(dict.fromkeys(
+        attachment_info["message_id"] for attachment_info in attachments if "attachment_id" not in attachment_info
+    ))
+    attachment_maps = dict(zip(message_ids, await asyncio.to_thread(gmail_service.get_attachment_maps, message_ids)))
+
+    attachment_refs = []
+    for attachment_info in attachments:
+        if "attachment_id" in attachment_info:
+            attachment_refs.append((attachment_info["message_id"], attachment_info["attachment_id"]))
+            continue
+        email_attachments = attachment_maps[attachment_info["message_id"]]
+        part = email_attachments.get(attachment_info["part_id"]) if email_attachments is not None else None
+        attachment_refs.append((attachment_info["message_id"], part["attachmentId"]) if part is not None else None)
+
+    # Then fetch each distinct attachment payload once, in a second batch
+    unique_refs = list(dict.fromkeys(ref for ref in attachment_refs if ref is not None))
+    attachments_data = dict(zip(unique_refs, await asyncio.to_thread(gmail_service.get_attachments, unique_refs)))
+
+    save_slots = asyncio.Semaphore(MAX_CONCURRENT_SAVES)
+
+    async def save_attachment(attachment_info: dict, file_data: str) -> TextContent:
+        try:
+            async with save_slots:
+                await asyncio.to_thread(_decode_and_write, file_data, attachment_info["save_path"])
+            return TextContent(
+                type="text",
+                text=f"Attachment saved to: {attachment_info['save_path']}",
+            )
+        except Exception as e:
+            return TextContent(
+                type="text",
+                text=f"Failed to save attachment to {attachment_info['save_path']}: {str(e)}",
+            )
 
-        if result is None:
-            return f"Failed to {'send' if send else 'draft'} reply email"
+    # Decode and write attachments concurrently, keeping results in input order
+    pending_saves = {}
+    for attachment_info, attachment_ref in zip(attachments, attachment_refs):
+        if attachment_ref is None:
+            if attachment_maps[attachment_info["message_id"]] is None:
+                text = f"Failed to retrieve message with ID: {attachment_info['message_id']}"
+            else:
+                text = f"Failed to find attachment with part ID: {attachment_info['part_id']} in message: {attachment_info['message_id']}"
+            results.append(TextContent(type="text", text=text))
+            continue
+        attachment_data = attachments_data[attachment_ref]
+        if attachment_data is None:
+            results.append(
+                TextContent(
+                    type="text",
+                    text=f"Failed to retrieve attachment with ID: {attachment_ref[1]} from message: {attachment_info['message_id']}",
+                )
+            )
+            continue
 
-        return json.dumps(result, indent=2)
+        pending_saves[len(results)] = save_attachment(attachment_info, attachment_data["data"])
+        results.append(None)
 
+    await asyncio.to_thread(_ensure_parent_dirs, [attachments[index]["save_path"] for index in pending_saves])
+    saved = await asyncio.gather(*pending_saves.values())
+    for index, result in zip(pending_saves, saved):
+        results[index] = result
 
-    @mcp.tool(name="get_gmail_attachment")
-    def get_gmail_attachment(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        message_id: Annotated[str, Field(description="The ID of the Gmail message containing the attachment")],
-        attachment_id: Annotated[str, Field(description="The ID of the attachment to retrieve")],
-        mime_type: Annotated[str, Field(description="The MIME type of the attachment")],
-        filename: Annotated[str, Field(description="The filename of the attachment")],
-        save_to_disk: Annotated[str | None, Field(description="The fullpath to save the attachment to disk. If not provided, the attachment is returned as a resource.")] = None,
-    ) -> str | EmbeddedResource:
-        """Retrieves a Gmail attachment by its ID."""
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-        attachment_data = gmail_service.get_attachment(message_id, attachment_id)
+    return results
 
-        if attachment_data is None:
-            return f"Failed to retrieve attachment with ID: {attachment_id} from message: {message_id}"
-
-        file_data = attachment_data["data"]
-        attachment_url = f"attachment://gmail/{message_id}/{attachment_id}/{filename}"
-        if save_to_disk:
-            decoded_data = decode_base64_data(file_data)
-            with open(save_to_disk, "wb") as f:
-                f.write(decoded_data)
-            return f"Attachment saved to disk: {save_to_disk}"
-        return EmbeddedResource(
-            type="resource",
-            resource=BlobResourceContents(
-                blob=file_data,
-                uri=AnyUrl(attachment_url),
-                mimeType=mime_type,
-            ),
-        )
 
+GMAIL_TOOLS = (
+    query_gmail_emails,
+    get_gmail_email,
+    create_gmail_draft,
+    delete_gmail_draft,
+    reply_gmail_email,
+    get_gmail_attachment,
+    bulk_get_gmail_emails,
+    bulk_save_gmail_attachments,
+)
 
-    @mcp.tool(name="bulk_get_gmail_emails")
-    def bulk_get_gmail_emails(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        email_ids: Annotated[list[str], Field(description="List of Gmail message IDs to retrieve")]
-    ) -> str:
-        """Retrieves multiple Gmail email messages by their IDs in a single request, including the full message bodies and attachment IDs."""
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-
-        results = []
-        for email_id in email_ids:
-            email, attachments = gmail_service.get_email_by_id_with_attachments(email_id)
-            if email is not None:
-                email["attachments"] = attachments
-                results.append(email)
-
-        if not results:
-            return "Failed to retrieve any emails from the provided IDs"
-
-        return json.dumps(results, indent=2)
-
-
-    @mcp.tool(name="bulk_save_gmail_attachments")
-    def bulk_save_gmail_attachments(
-        __user_id__: Annotated[str, Field(description=f"The EMAIL of the Google account for which you are executing this action. Must be one of: {', '.join(user_id_examples_formatted)}", examples=user_id_examples)],
-        attachments: Annotated[list[dict], Field(description="A list of dictionaries, each containing 'message_id', 'part_id', and 'save_path' for attachments to save.")]
-    ) -> list[TextContent]:
-        """Saves multiple Gmail attachments to disk by their message IDs and attachment IDs in a single request."""
-        require_auth(__user_id__)
-        gmail_service = gmail.GmailService(user_id=__user_id__)
-        results = []
-
-        for attachment_info in attachments:
-            # get attachment data from message_id and part_id
-            message, email_attachments = gmail_service.get_email_by_id_with_attachments(
-                attachment_info["message_id"]
-            )
-            if message is None:
-                results.append(
-                    TextContent(
-                        type="text",
-                        text=f"Failed to retrieve message with ID: {attachment_info['message_id']}",
-                    )
-                )
-                continue
-            # get attachment_id from part_id
-            attachment_id = email_attachments[attachment_info["part_id"]]["attachmentId"]
-            attachment_data = gmail_service.get_attachment(
-                attachment_info["message_id"], attachment_id
-            )
-            if attachment_data is None:
-                results.append(
-                    TextContent(
-                        type="text",
-                        text=f"Failed to retrieve attachment with ID: {attachment_id} from message: {attachment_info['message_id']}",
-                    )
-                )
-                continue
-
-            file_data = attachment_data["data"]
-            try:
-                decoded_data = decode_base64_data(file_data)
-                with open(attachment_info["save_path"], "wb") as f:
-                    f.write(decoded_data)
-                results.append(
-                    TextContent(
-                        type="text",
-                        text=f"Attachment saved to: {attachment_info['save_path']}",
-                    )
-                )
-            except Exception as e:
-                results.append(
-                    TextContent(
-                        type="text",
-                        text=f"Failed to save attachment to {attachment_info['save_path']}: {str(e)}",
-                    )
-                )
-                continue
 
-        return results
\ No newline at end of file
+def register_gmail_tools(mcp: FastMCP):
+    for tool in GMAIL_TOOLS:
+        mcp.tool(tool)
@@ -1,15 +1,15 @@
 """Instantiates the MCP server and registers all tools."""
+import asyncio
+import os
 from fastmcp.server import FastMCP
 from .logs import logger
 from . import gauth
+from .auth_utils import get_accounts
 from .gmail_tools import register_gmail_tools
 from .calendar_tools import register_calendar_tools
 
-accounts = gauth.get_account_info()
-for account in accounts:
-    creds = gauth.get_stored_credentials(user_id=account.email)
-    if creds:
-        logger.info(f"🗝️  Found credentials for: {account.email}")
+# the startup scan reads every account's stored credentials from disk just to log them
+LOG_STORED_CREDENTIALS = os.getenv("LOG_STORED_CREDENTIALS", "true").lower() not in ("0", "false", "no")
 
 mcp = FastMCP("gsuite-mcp")
 register_gmail_tools(mcp)
@@ -19,5 +19,17 @@ register_calendar_tools(mcp)
 # from .tools_drive import register_drive_tools
 # register_drive_tools(mcp)
 
+async def log_stored_credentials():
+    """Reports which configured accounts already have stored credentials, reading them concurrently."""
+    accounts = get_accounts()
+    credentials = await asyncio.gather(
+        *[asyncio.to_thread(gauth.get_stored_credentials, user_id=account.email) for account in accounts]
+    )
+    for account, creds in zip(accounts, credentials):
+        if creds:
+            logger.info(f"🗝️  Found credentials for: {account.email}")
+
 async def init():
-    await mcp.run_async(transport="stdio")
\ No newline at end of file
+    if LOG_STORED_CREDENTIALS:
+        await log_stored_credentials()
+    await mcp.run_async(transport="stdio")
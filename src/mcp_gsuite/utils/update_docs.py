@@ -3,9 +3,27 @@
 import requests
 import os
 import json
+import stat
+import tempfile
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 DOCS_DIR = os.path.join(os.path.dirname(__file__), "../../../docs")
+MAX_PARALLEL_DOWNLOADS = 8
+REQUEST_TIMEOUT = 30  # seconds
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _current_umask() -> int:
+    # the umask can only be read by setting it, so put it straight back
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+# Mode a plain open() would give a new doc; NamedTemporaryFile always creates its files as 0600.
+# Read once at import, since changing the umask while downloads run on other threads would race
+NEW_DOC_MODE = 0o666 & ~_current_umask()
 
 
 def update_dev_docs():
@@ -54,31 +72,61 @@ def update_dev_docs():
 
     print(f"Found settings for {len(docs.get('docs', []))} docs to update")
 
-    # Download the docs
-    for doc_item in docs.get("docs", []):
-        name = doc_item.get("title")
-        url = doc_item.get("url")
-        
-        if not name or not url:
-            print(f"Skipping malformed doc entry: {doc_item}")
-            continue
+    # Download the docs in parallel over one pooled session
+    doc_items = docs.get("docs", [])
+    with requests.Session() as session:
+        adapter = HTTPAdapter(max_retries=3, pool_maxsize=MAX_PARALLEL_DOWNLOADS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+            for doc_item in doc_items:
+                executor.submit(download_doc, session, docs_dir, doc_item)
 
-        try:
-            response = requests.get(url)
+
+def download_doc(session: requests.Session, docs_dir: str, doc_item: dict):
+    """Downloads a single docs.json entry into docs_dir."""
+    name = doc_item.get("title")
+    url = doc_item.get("url")
+
+    if not name or not url:
+        print(f"Skipping malformed doc entry: {doc_item}")
+        return
+
+    doc_filepath = os.path.join(docs_dir, name)
+    temp_filepath = None
+    try:
+        with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
             response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
 
-            doc_filepath = os.path.join(docs_dir, name)
-            
-            with open(doc_filepath, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print(f"Successfully updated {doc_filepath}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error downloading the file: {e}")
-        except IOError as e:
-            print(f"Error writing to file {doc_filepath}: {e}")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            print(traceback.format_exc())
+            # stream the body to disk as-is instead of decoding it all into memory first;
+            # iter_content (unlike response.raw) still undoes any gzip content encoding.
+            # Write to a temp file next to the doc so a failed download keeps the old doc
+            with tempfile.NamedTemporaryFile("wb", dir=docs_dir, prefix=f".{name}.", suffix=".tmp", delete=False) as f:
+                temp_filepath = f.name
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        # keep the permissions of the doc being replaced
+        try:
+            mode = stat.S_IMODE(os.stat(doc_filepath).st_mode)
+        except FileNotFoundError:
+            mode = NEW_DOC_MODE
+        os.chmod(temp_filepath, mode)
+        os.replace(temp_filepath, doc_filepath)
+        temp_filepath = None
+        print(f"Successfully updated {doc_filepath}")
+    except requests.exceptions.RequestException as e:
+        print(f"Error downloading the file: {e}")
+    except IOError as e:
+        print(f"Error writing to file {doc_filepath}: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        print(traceback.format_exc())
+    finally:
+        if temp_filepath is not None:
+            try:
+                os.remove(temp_filepath)
+            except OSError:
+                pass
 
 if __name__ == "__main__":
     update_dev_docs()
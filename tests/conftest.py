@@ -1,4 +1,30 @@
 import sys
 import os
+import pytest
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
\ No newline at end of file
+try:
+    # faster event loop for the async tests, used when installed
+    import uvloop
+except ImportError:
+    uvloop = None
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+@pytest.fixture(scope="session")
+def mcp_server():
+    """The server's FastMCP instance, imported on first use.
+
+    Importing the server registers every tool and builds its argument schema, so test
+    modules that only call tool functions directly never pay for it.
+    """
+    from mcp_gsuite.server import mcp
+    return mcp
+
+
+if uvloop is not None:
+    # optional: pytest-asyncio versions without loop factories just keep their default loop
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """Creates the session's event loop with uvloop."""
+        return {"uvloop": uvloop.new_event_loop}
@@ -0,0 +1,236 @@
+import datetime
+import httplib2
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from unittest.mock import MagicMock, patch
+
+from googleapiclient.errors import HttpError
+
+from mcp_gsuite import auth_utils
+from mcp_gsuite.gauth import AccountInfo
+
+USER_ID = "your.name@example.com"
+
+
+def make_credentials(expires_in: int):
+    credentials = MagicMock()
+    credentials.access_token_expired = False
+    credentials.token_expiry = (
+        datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        + datetime.timedelta(seconds=expires_in)
+    )
+    return credentials
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_cache():
+    auth_utils._auth_cache.clear()
+    auth_utils._accounts_cache = None
+    auth_utils._auth_in_progress.clear()
+    yield
+    auth_utils._auth_cache.clear()
+    auth_utils._accounts_cache = None
+    auth_utils._auth_in_progress.clear()
+
+
+@pytest.fixture
+def mock_gauth():
+    with patch.object(auth_utils, "gauth") as mock_gauth:
+        mock_gauth.get_account_info.return_value = [AccountInfo(email=USER_ID, account_type="personal")]
+        yield mock_gauth
+
+
+def test_setup_oauth2_uses_cached_credentials(mock_gauth):
+    mock_gauth.get_stored_credentials.return_value = make_credentials(expires_in=3600)
+
+    auth_utils.setup_oauth2(USER_ID)
+    auth_utils.setup_oauth2(USER_ID)
+
+    mock_gauth.get_stored_credentials.assert_called_once()
+    mock_gauth.get_stored_credentials.return_value.refresh.assert_not_called()
+    mock_gauth.get_user_info.assert_not_called()
+    mock_gauth.store_credentials.assert_not_called()
+
+
+def test_setup_oauth2_refreshes_near_expiry(mock_gauth):
+    credentials = make_credentials(expires_in=auth_utils.TOKEN_EXPIRY_MARGIN - 1)
+    mock_gauth.get_stored_credentials.return_value = credentials
+
+    auth_utils.setup_oauth2(USER_ID)
+    auth_utils.setup_oauth2(USER_ID)
+
+    # the mock refresh does not extend the expiry, so nothing gets cached
+    assert credentials.refresh.call_count == 2
+    assert mock_gauth.store_credentials.call_count == 2
+    assert auth_utils.get_cached_credentials(USER_ID) is None
+
+
+def test_setup_oauth2_reverifies_stale_credentials_from_memory(mock_gauth):
+    mock_gauth.get_stored_credentials.return_value = make_credentials(expires_in=3600)
+
+    auth_utils.setup_oauth2(USER_ID)
+    with patch.object(auth_utils.time, "monotonic", return_value=auth_utils.time.monotonic() + 3600):
+        auth_utils.setup_oauth2(USER_ID)
+
+    mock_gauth.get_account_info.assert_called_once()
+    mock_gauth.get_stored_credentials.assert_called_once()
+
+
+def test_setup_oauth2_refreshes_once_for_concurrent_calls(mock_gauth):
+    credentials = make_credentials(expires_in=0)
+    credentials.access_token_expired = True
+
+    def refresh(http):
+        time.sleep(0.05)
+        credentials.access_token_expired = False
+        credentials.token_expiry += datetime.timedelta(seconds=3600)
+
+    credentials.refresh.side_effect = refresh
+    mock_gauth.get_stored_credentials.return_value = credentials
+
+    threads = [threading.Thread(target=auth_utils.setup_oauth2, args=(USER_ID,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    credentials.refresh.assert_called_once()
+    mock_gauth.store_credentials.assert_called_once()
+
+
+def test_setup_oauth2_rejects_unknown_account(mock_gauth):
+    with pytest.raises(RuntimeError, match="not specified"):
+        auth_utils.setup_oauth2("someone.else@example.com")
+    mock_gauth.get_stored_credentials.assert_not_called()
+
+
+def test_cache_credentials_caps_ttl():
+    credentials = make_credentials(expires_in=3600)
+    with patch.object(auth_utils.time, "monotonic", return_value=1000.0):
+        auth_utils.cache_credentials(USER_ID, credentials)
+    deadline, _ = auth_utils._auth_cache[USER_ID]
+    assert deadline == 1000.0 + auth_utils.MAX_OAUTH_TOKEN_CACHE_TTL
+
+
+def test_invalidate_on_unauthorized():
+    auth_utils.cache_credentials(USER_ID, make_credentials(expires_in=3600))
+
+    auth_utils.invalidate_on_unauthorized(USER_ID, RuntimeError("unrelated"))
+    assert auth_utils.get_cached_credentials(USER_ID) is not None
+
+    auth_utils.invalidate_on_unauthorized(USER_ID, HttpError(httplib2.Response({"status": 401}), b""))
+    assert auth_utils.get_cached_credentials(USER_ID) is None
+
+
+def test_start_auth_flow_uses_ephemeral_callback_port(mock_gauth):
+    mock_gauth.get_oauth_callback_port.return_value = 0
+    mock_gauth.get_authorization_url.side_effect = lambda user_id, state, redirect_uri: redirect_uri
+
+    def open_browser(url, new):
+        # simulate Google redirecting back to the local listener
+        threading.Thread(target=urllib.request.urlopen, args=(f"{url}?code=abc",), daemon=True).start()
+
+    with patch.object(auth_utils.webbrowser, "open", side_effect=open_browser):
+        auth_utils.start_auth_flow(USER_ID)
+
+    redirect_uri = mock_gauth.get_authorization_url.call_args.kwargs["redirect_uri"]
+    assert redirect_uri.startswith("http://localhost:") and not redirect_uri.startswith("http://localhost:0/")
+    mock_gauth.get_credentials.assert_called_once_with(authorization_code="abc", state={}, redirect_uri=redirect_uri)
+
+
+def test_start_auth_flow_waits_for_flow_in_progress(mock_gauth):
+    mock_gauth.get_oauth_callback_port.return_value = 0
+    mock_gauth.get_authorization_url.side_effect = lambda user_id, state, redirect_uri: redirect_uri
+    browser_opened = threading.Event()
+
+    def open_browser(url, new):
+        browser_opened.set()
+        # give the second caller time to find the flow in progress before completing it
+        threading.Timer(0.1, urllib.request.urlopen, args=(f"{url}?code=abc",)).start()
+
+    with patch.object(auth_utils.webbrowser, "open", side_effect=open_browser) as mock_open:
+        first = threading.Thread(target=auth_utils.start_auth_flow, args=(USER_ID,))
+        first.start()
+        assert browser_opened.wait(timeout=5)
+        auth_utils.start_auth_flow(USER_ID)
+        first.join()
+
+    mock_open.assert_called_once()
+    mock_gauth.get_credentials.assert_called_once()
+    assert USER_ID not in auth_utils._auth_in_progress
+
+
+def test_require_auth_returns_error_instead_of_running_tool():
+    tool = MagicMock(return_value="ran")
+    wrapped = auth_utils.require_auth(tool)
+
+    with patch.object(auth_utils, "setup_oauth2", side_effect=RuntimeError("no credentials")):
+        assert wrapped(__user_id__=USER_ID) == "setup_oauth2 error: no credentials"
+    tool.assert_not_called()
+
+    with patch.object(auth_utils, "setup_oauth2") as mock_setup:
+        assert wrapped(__user_id__=USER_ID) == "ran"
+    mock_setup.assert_called_once_with(user_id=USER_ID)
+
+
+async def test_require_auth_wraps_coroutine_tools():
+    @auth_utils.require_auth
+    async def tool(__user_id__: str) -> str:
+        return "ran"
+
+    with patch.object(auth_utils, "setup_oauth2") as mock_setup:
+        assert await tool(USER_ID) == "ran"
+    mock_setup.assert_called_once_with(user_id=USER_ID)
+
+
+def test_start_auth_flow_reports_failed_code_exchange_to_waiters(mock_gauth):
+    mock_gauth.get_oauth_callback_port.return_value = 0
+    mock_gauth.get_authorization_url.side_effect = lambda user_id, state, redirect_uri: redirect_uri
+    mock_gauth.get_credentials.side_effect = RuntimeError("exchange failed")
+    browser_opened = threading.Event()
+    errors = []
+
+    def callback(url):
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url)
+
+    def open_browser(url, new):
+        browser_opened.set()
+        threading.Timer(0.1, callback, args=(f"{url}?code=abc",)).start()
+
+    def run_flow():
+        try:
+            auth_utils.start_auth_flow(USER_ID)
+        except RuntimeError as e:
+            errors.append(e)
+
+    with patch.object(auth_utils.webbrowser, "open", side_effect=open_browser):
+        first = threading.Thread(target=run_flow)
+        first.start()
+        assert browser_opened.wait(timeout=5)
+        with pytest.raises(RuntimeError, match="exchange failed"):
+            auth_utils.start_auth_flow(USER_ID)
+        first.join(timeout=5)
+
+    assert not first.is_alive()
+    assert len(errors) == 1 and "exchange failed" in str(errors[0])
+    assert USER_ID not in auth_utils._auth_in_progress
+
+
+def test_start_auth_flow_times_out(mock_gauth, monkeypatch):
+    monkeypatch.setattr(auth_utils, "AUTH_FLOW_TIMEOUT", 0.1)
+    mock_gauth.get_oauth_callback_port.return_value = 0
+
+    # nobody completes the flow in the browser
+    with patch.object(auth_utils.webbrowser, "open"):
+        with pytest.raises(RuntimeError, match="timed out"):
+            auth_utils.start_auth_flow(USER_ID)
+    assert USER_ID not in auth_utils._auth_in_progress
+
+    # a waiter gives up on a flow that never finishes
+    auth_utils._auth_in_progress[USER_ID] = auth_utils._AuthFlow()
+    with pytest.raises(RuntimeError, match="Timed out waiting"):
+        auth_utils.start_auth_flow(USER_ID)
@@ -0,0 +1,88 @@
+import datetime
+import json
+import threading
+
+import pytest
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+from oauth2client.client import OAuth2Credentials
+
+from mcp_gsuite import gauth
+
+USER_ID = "your.name@example.com"
+
+
+def make_credentials():
+    return OAuth2Credentials(
+        access_token="token",
+        client_id="client",
+        client_secret="secret",
+        refresh_token="refresh",
+        token_expiry=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1),
+        token_uri="https://oauth2.googleapis.com/token",
+        user_agent=None,
+    )
+
+
+def test_get_authorized_http_is_reused_per_thread():
+    credentials = make_credentials()
+    http = gauth.get_authorized_http(USER_ID, credentials)
+    assert gauth.get_authorized_http(USER_ID, credentials) is http
+
+    other_thread_http = []
+    thread = threading.Thread(target=lambda: other_thread_http.append(gauth.get_authorized_http(USER_ID, credentials)))
+    thread.start()
+    thread.join()
+    assert other_thread_http[0] is not http
+
+    # new credentials for the same user get a freshly authorized http
+    assert gauth.get_authorized_http(USER_ID, make_credentials()) is not http
+
+
+def test_build_service_requests_use_thread_http():
+    credentials = make_credentials()
+    service = gauth.build_service("gmail", "v1", user_id=USER_ID, credentials=credentials)
+    request = service.users().messages().get(userId="me", id="123")
+    assert request.http is gauth.get_authorized_http(USER_ID, credentials)
+
+
+def test_build_service_parses_responses_with_orjson():
+    pytest.importorskip("orjson")
+    service = gauth.build_service("gmail", "v1", user_id=USER_ID, credentials=make_credentials())
+    request = service.users().messages().get(userId="me", id="123")
+    assert isinstance(request.postproc.__self__, gauth.OrjsonModel)
+
+    http = HttpMockSequence([
+        ({"status": "200"}, b'{"id": "123", "labelIds": ["INBOX"]}'),
+        # bodies orjson cannot parse fall back to JsonModel, which returns them as text
+        ({"status": "200"}, b"not json"),
+        ({"status": "200"}, b""),
+        ({"status": "404"}, b'{"error": {"code": 404, "message": "Not Found"}}'),
+    ])
+    assert request.execute(http=http) == {"id": "123", "labelIds": ["INBOX"]}
+    assert request.execute(http=http) == "not json"
+    assert request.execute(http=http) == ""
+    with pytest.raises(HttpError) as excinfo:
+        request.execute(http=http)
+    assert excinfo.value.resp.status == 404
+
+
+def write_client_secrets(tmp_path, client_type, redirect_uris):
+    path = tmp_path / ".gauth.json"
+    path.write_text(json.dumps({client_type: {"client_id": "client", "redirect_uris": redirect_uris}}))
+    return str(path)
+
+
+def test_get_oauth_callback_port(tmp_path, monkeypatch):
+    monkeypatch.setattr(gauth, "OAUTH_CALLBACK_PORT", None)
+
+    # web clients only accept their registered redirect URI
+    monkeypatch.setattr(gauth, "CLIENTSECRETS_LOCATION", write_client_secrets(tmp_path, "web", ["http://localhost:4100/code"]))
+    assert gauth.get_oauth_callback_port() == 4100
+
+    # installed (Desktop app) clients accept any loopback port
+    monkeypatch.setattr(gauth, "CLIENTSECRETS_LOCATION", write_client_secrets(tmp_path, "installed", ["http://localhost"]))
+    assert gauth.get_oauth_callback_port() == 0
+
+    monkeypatch.setattr(gauth, "OAUTH_CALLBACK_PORT", "4200")
+    assert gauth.get_oauth_callback_port() == 4200
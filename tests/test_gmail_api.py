@@ -0,0 +1,151 @@
+import httplib2
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, sentinel
+
+from googleapiclient.errors import HttpError
+
+from mcp_gsuite import auth_utils
+from mcp_gsuite.api import gmail
+
+
+class FakeBatch:
+    """Stands in for BatchHttpRequest, answering every request from `responses`."""
+
+    def __init__(self, responses, callback, batches):
+        self.responses = responses
+        self.callback = callback
+        self.requests = []
+        batches.append(self)
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.http = http
+        for request_id, request in self.requests:
+            response = self.responses.get(request, RuntimeError("not found"))
+            if isinstance(response, Exception):
+                self.callback(request_id, None, response)
+            else:
+                self.callback(request_id, response, None)
+
+
+@pytest.fixture
+def gmail_service():
+    # only ever asked to authorize the batch's http, so a plain stub will do
+    credentials = SimpleNamespace(authorize=lambda http: http)
+    with patch.object(gmail.gauth, "get_stored_credentials", return_value=credentials), \
+            patch.object(gmail.gauth, "build_service") as mock_build:
+        service = gmail.GmailService(user_id="your.name@example.com")
+        service.responses = {}
+        service.batches = []
+        api = mock_build.return_value
+        api.users().messages().get.side_effect = lambda userId, id: ("message", id)
+        api.users().messages().attachments().get.side_effect = lambda userId, messageId, id: ("attachment", messageId, id)
+        api.new_batch_http_request.side_effect = lambda callback: FakeBatch(service.responses, callback, service.batches)
+        yield service
+
+
+def test_get_emails_by_ids_with_attachments(gmail_service):
+    gmail_service.responses[("message", "m1")] = {
+        "id": "m1",
+        "payload": {
+            "mimeType": "multipart/mixed",
+            "headers": [{"name": "Subject", "value": "Hello"}],
+            "parts": [{"partId": "1", "filename": "a.txt", "mimeType": "text/plain", "body": {"attachmentId": "att1"}}],
+        },
+    }
+    gmail_service.responses[("message", "m2")] = RuntimeError("not found")
+
+    results = gmail_service.get_emails_by_ids_with_attachments(["m1", "m2"])
+
+    assert len(gmail_service.batches) == 1
+    assert results[0][0]["subject"] == "Hello"
+    assert results[0][1]["1"]["attachmentId"] == "att1"
+    assert results[1] == (None, {})
+
+
+def test_get_emails_by_ids_with_attachments_splits_batches(gmail_service):
+    email_ids = [f"m{i}" for i in range(gmail.BATCH_SIZE + 1)]
+    for email_id in email_ids:
+        gmail_service.responses[("message", email_id)] = {"id": email_id, "payload": {}}
+
+    results = gmail_service.get_emails_by_ids_with_attachments(email_ids)
+
+    # batches run in parallel, so they may be created in any order
+    assert sorted(len(batch.requests) for batch in gmail_service.batches) == [1, gmail.BATCH_SIZE]
+    assert all(batch.http is not None for batch in gmail_service.batches)
+    assert [email["id"] for email, _ in results] == email_ids
+
+
+def test_get_attachments(gmail_service):
+    gmail_service.responses[("attachment", "m1", "att1")] = {"size": 5, "data": "SGVsbG8="}
+
+    results = gmail_service.get_attachments([("m1", "att1"), ("m1", "missing")])
+
+    assert results == [{"size": 5, "data": "SGVsbG8="}, None]
+
+
+def test_get_gmail_service_rebuilt_after_unauthorized():
+    gmail.get_gmail_service.cache_clear()
+    with patch.object(gmail.gauth, "get_stored_credentials", return_value=sentinel.credentials), \
+            patch.object(gmail.gauth, "build_service"):
+        service = gmail.get_gmail_service("your.name@example.com")
+        assert gmail.get_gmail_service("your.name@example.com") is service
+
+        gmail.invalidate_on_unauthorized("your.name@example.com", HttpError(httplib2.Response({"status": 401}), b""))
+
+        assert gmail.get_gmail_service("your.name@example.com") is not service
+    gmail.get_gmail_service.cache_clear()
+
+
+def test_query_emails_fetches_metadata_only(gmail_service):
+    messages = gmail_service.service.users().messages()
+    messages.list().execute.return_value = {"messages": [{"id": "m1"}]}
+    messages.get.side_effect = None
+    messages.get.return_value.execute.return_value = {
+        "id": "m1",
+        "payload": {"headers": [{"name": "Subject", "value": "Hello"}]},
+    }
+
+    emails = gmail_service.query_emails(query="is:unread")
+
+    messages.get.assert_called_once_with(
+        userId="me", id="m1", format="metadata", metadataHeaders=gmail.METADATA_HEADERS
+    )
+    assert emails[0]["subject"] == "Hello"
+
+
+def test_get_attachment_maps_reuses_fetched_messages(gmail_service):
+    gmail_service.responses[("message", "m1")] = {
+        "id": "m1",
+        "payload": {"parts": [{"partId": "1", "filename": "a.txt", "mimeType": "text/plain", "body": {"attachmentId": "att1"}}]},
+    }
+
+    assert gmail_service.get_attachment_maps(["m1", "m2"])[0]["1"]["attachmentId"] == "att1"
+    maps = gmail_service.get_attachment_maps(["m1", "m2"])
+
+    assert maps[0]["1"]["attachmentId"] == "att1"
+    assert maps[1] is None
+    # m1 is only fetched the first time; m2 failed and is retried
+    assert [[request for _, request in batch.requests] for batch in gmail_service.batches] == [
+        [("message", "m1"), ("message", "m2")],
+        [("message", "m2")],
+    ]
+
+
+def test_gmail_service_shares_setup_oauth2_credentials():
+    credentials = SimpleNamespace(authorize=lambda http: http, token_expiry=None)
+    auth_utils.cache_credentials("your.name@example.com", credentials)
+    try:
+        with patch.object(gmail.gauth, "get_stored_credentials") as mock_stored, \
+                patch.object(gmail.gauth, "build_service") as mock_build:
+            service = gmail.GmailService(user_id="your.name@example.com")
+    finally:
+        auth_utils.invalidate_auth_cache("your.name@example.com")
+
+    # the object setup_oauth2 refreshes is the one the API client authorizes with
+    assert service.credentials is credentials
+    assert mock_build.call_args.kwargs["credentials"] is credentials
+    mock_stored.assert_not_called()
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, call, patch
+
+from mcp_gsuite import server
+
+ACCOUNTS = [SimpleNamespace(email="one@example.com"), SimpleNamespace(email="two@example.com")]
+
+
+async def run_init(log_stored_credentials: bool, stored_credentials):
+    with patch.object(server, "LOG_STORED_CREDENTIALS", log_stored_credentials), \
+            patch.object(server, "get_accounts", return_value=ACCOUNTS) as get_accounts, \
+            patch.object(server.gauth, "get_stored_credentials", side_effect=stored_credentials) as get_stored_credentials, \
+            patch.object(server.mcp, "run_async", new_callable=AsyncMock) as run_async, \
+            patch.object(server, "logger") as logger:
+        await server.init()
+    run_async.assert_awaited_once_with(transport="stdio")
+    return get_accounts, get_stored_credentials, logger
+
+
+async def test_init_skips_credential_scan_when_disabled():
+    get_accounts, get_stored_credentials, logger = await run_init(False, [object(), object()])
+    get_accounts.assert_not_called()
+    get_stored_credentials.assert_not_called()
+    logger.info.assert_not_called()
+
+
+async def test_init_logs_every_account_with_stored_credentials():
+    get_accounts, get_stored_credentials, logger = await run_init(True, [object(), object()])
+    get_accounts.assert_called_once_with()
+    # the accounts are read concurrently, in no particular order
+    assert sorted(c.kwargs["user_id"] for c in get_stored_credentials.call_args_list) == ["one@example.com", "two@example.com"]
+    assert logger.info.call_args_list == [
+        call("🗝️  Found credentials for: one@example.com"),
+        call("🗝️  Found credentials for: two@example.com"),
+    ]
+
+
+async def test_log_stored_credentials_skips_accounts_without_credentials():
+    with patch.object(server, "get_accounts", return_value=ACCOUNTS), \
+            patch.object(server.gauth, "get_stored_credentials", side_effect=lambda user_id: None if user_id == "one@example.com" else object()), \
+            patch.object(server, "logger") as logger:
+        await server.log_stored_credentials()
+    logger.info.assert_called_once_with("🗝️  Found credentials for: two@example.com")
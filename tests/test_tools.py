@@ -2,139 +2,254 @@ import pytest
 import pytest_asyncio
 from typing import Any
 from fastmcp import FastMCP, Client
-from unittest.mock import MagicMock, patch
+from unittest.mock import call, create_autospec
+import base64
+import binascii
 import json
 import os
 
+# decode tool results with the fastest parser installed
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        _loads = msgspec.json.decode
+    except ImportError:
+        _loads = json.loads
+
 # Import the tools directly
-from mcp_gsuite import tools_gmail
+from mcp_gsuite import gmail_tools
 from mcp_gsuite import calendar_tools
+from mcp_gsuite._json_utils import to_json
+from mcp_gsuite.api import calendar, gmail
 from mcp.types import EmbeddedResource, BlobResourceContents, TextContent
-from pydantic import AnyUrl
-
-# Import the actual mcp instance
-from mcp_gsuite.server import mcp as actual_mcp_server
 
-@pytest_asyncio.fixture
-async def mcp_server():
-    """FastMCP fixture for testing"""
-    yield actual_mcp_server
-
-@pytest_asyncio.fixture
+# Most tests call the tool functions directly; test_query_gmail_emails goes through a
+# connected client to cover registration, argument validation and result conversion.
+# The server is a module-level singleton and tools look up their (mocked) services on
+# every call, so one connected client serves the whole session. The async tests are
+# pinned to its session loop explicitly rather than relying on the ini defaults.
+@pytest_asyncio.fixture(scope="session")
 async def mcp_client(mcp_server):
     async with Client(mcp_server) as client:
         yield client
 
-# New fixture for mocking GmailService
-@pytest.fixture
-def mock_gmail_service():
-    with patch('mcp_gsuite.gmail.GmailService') as mock_service_class:
-        mock_instance = MagicMock()
-        mock_service_class.return_value = mock_instance
+# The service mocks are built and patched in once per module (and undone afterwards, so
+# other test modules see the real factories); each test gets the same mock back with
+# its calls, return values and side effects cleared. Specced on the real services,
+# building them walks the class once, and tools calling methods that don't exist or
+# with the wrong arguments fail the test.
+@pytest.fixture(scope="module")
+def _shared_gmail_service():
+    mock_instance = create_autospec(gmail.GmailService, instance=True)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('mcp_gsuite.api.gmail.get_gmail_service', lambda *args, **kwargs: mock_instance)
         yield mock_instance
 
-# New fixture for mocking CalendarService
-@pytest.fixture
-def mock_calendar_service():
-    with patch('mcp_gsuite.calendar.CalendarService') as mock_service_class:
-        mock_instance = MagicMock()
-        mock_service_class.return_value = mock_instance
+@pytest.fixture(scope="module")
+def _shared_calendar_service():
+    mock_instance = create_autospec(calendar.CalendarService, instance=True)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('mcp_gsuite.api.calendar.get_calendar_service', lambda *args, **kwargs: mock_instance)
         yield mock_instance
 
-# Mock setup_oauth2 to prevent FileNotFoundError during tests
-@pytest.fixture(autouse=True)
+@pytest.fixture
+def mock_gmail_service(_shared_gmail_service):
+    _shared_gmail_service.reset_mock(return_value=True, side_effect=True)
+    return _shared_gmail_service
+
+@pytest.fixture
+def mock_calendar_service(_shared_calendar_service):
+    _shared_calendar_service.reset_mock(return_value=True, side_effect=True)
+    return _shared_calendar_service
+
+# Mock setup_oauth2 to prevent FileNotFoundError during tests; no test looks at its calls
+@pytest.fixture(scope="module", autouse=True)
 def mock_setup_oauth2():
-    with patch('mcp_gsuite.auth_utils.setup_oauth2') as mock_setup:
-        mock_setup.return_value = None # Or a dummy value if needed
-        yield mock_setup
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('mcp_gsuite.auth_utils.setup_oauth2', lambda user_id: None)
+        yield
+
+# Attachment payloads as Gmail returns them, with the bytes they decode to
+_HELLO_WORLD_B64 = "SGVsbG8gV29ybGQh"
+_HELLO_WORLD = b"Hello World!"
+_HELLO_1_B64 = "SGVsbG8gMQ=="
+_HELLO_1 = b"Hello 1"
+_HELLO_2_B64 = "SGVsbG8gMg=="
+_HELLO_2 = b"Hello 2"
+
+# Runs a test against both base64 decoders: binascii, and pybase64 when it is installed
+@pytest.fixture(params=["binascii", "pybase64"])
+def base64_backend(request, monkeypatch):
+    if request.param == "binascii":
+        monkeypatch.setattr(gmail_tools, "pybase64", None)
+    else:
+        monkeypatch.setattr(gmail_tools, "pybase64", pytest.importorskip("pybase64"))
+    return request.param
 
 # Test for decode_base64_data
-def test_decode_base64_data():
-    # Standard base64
-    encoded_data = "SGVsbG8gV29ybGQh" # "Hello World!"
-    decoded = tools_gmail.decode_base64_data(encoded_data)
-    assert decoded == b"Hello World!"
-
-    # URL-safe base64
-    encoded_data_url_safe = "SGVsbG8gV29ybGQh-_==" # "Hello World!" with some url safe chars
-    decoded_url_safe = tools_gmail.decode_base64_data(encoded_data_url_safe)
-    assert decoded_url_safe == b"Hello World!\xfb" # Corrected assertion based on actual decoding
-
-    # With padding
-    encoded_data_padding = "Zm9vYmFy" # "foobar"
-    decoded_padding = tools_gmail.decode_base64_data(encoded_data_padding)
-    assert decoded_padding == b"foobar"
-
-    # No padding
-    encoded_data_no_padding = "Zm9vYmFyMg" # "foobar2"
-    decoded_no_padding = tools_gmail.decode_base64_data(encoded_data_no_padding)
-    assert decoded_no_padding == b"foobar2"
-
-    # Invalid base64
-    with pytest.raises(Exception):
-        tools_gmail.decode_base64_data("invalid-base64!")
+@pytest.mark.parametrize("encoded_data,expected", [
+    (_HELLO_WORLD_B64, _HELLO_WORLD), # standard base64
+    ("SGVsbG8gV29ybGQh-_==", b"Hello World!\xfb"), # URL-safe characters
+    ("Zm9vYmFy", b"foobar"), # no padding needed
+    ("Zm9vYmFyMg", b"foobar2"), # padding left off
+    ("a-b/", b"k\xe6\xff"), # URL-safe and standard characters mixed
+])
+def test_decode_base64_data(base64_backend, encoded_data, expected):
+    assert gmail_tools.decode_base64_data(encoded_data) == expected
+
+@pytest.mark.parametrize("encoded_data", [
+    "invalid-base64!", # not in either alphabet
+    "QQ==QQ==", # data after padding
+    "=QQQ", # padding first
+    "QQ=a", # padding in the middle
+    "Q", # too short to hold a byte
+    "QUJD\n", # whitespace
+])
+def test_decode_base64_data_invalid(base64_backend, encoded_data):
+    with pytest.raises(binascii.Error):
+        gmail_tools.decode_base64_data(encoded_data)
+
+def test_iter_decoded_base64_spans_chunks(base64_backend):
+    # not a multiple of 3 bytes, so the encoding needs padding that Gmail leaves off
+    data = bytes(range(256)) * (gmail_tools.DECODE_CHUNK_SIZE // 64) + b"tail"
+    padded = base64.urlsafe_b64encode(data).decode("ascii")
+    encoded = padded.rstrip("=")
+    assert "-" in encoded and "_" in encoded and encoded != padded
+    assert len(encoded) > 3 * gmail_tools.DECODE_CHUNK_SIZE
+
+    chunks = list(gmail_tools.iter_decoded_base64(encoded))
+
+    assert len(chunks) == -(-len(encoded) // gmail_tools.DECODE_CHUNK_SIZE)
+    assert all(len(chunk) == gmail_tools.DECODE_CHUNK_SIZE // 4 * 3 for chunk in chunks[:-1])
+    assert b"".join(chunks) == base64.urlsafe_b64decode(padded) == data
+
+def test_decode_and_write_rejects_oversized_attachment(tmp_path, monkeypatch):
+    monkeypatch.setattr(gmail_tools, "MAX_ATTACHMENT_BYTES", len(_HELLO_WORLD) - 1)
+    save_path = tmp_path / "too_large.txt"
+    decoded = []
+    iter_decoded_base64 = gmail_tools.iter_decoded_base64
+    monkeypatch.setattr(gmail_tools, "iter_decoded_base64", lambda data: decoded.append(data) or iter_decoded_base64(data))
+
+    with pytest.raises(gmail_tools.AttachmentTooLargeError):
+        gmail_tools._decode_and_write(_HELLO_WORLD_B64, str(save_path))
+    # rejected from the encoded length, before decoding anything or creating the file
+    assert decoded == []
+    assert not save_path.exists()
+
+    # exactly at the limit is still written
+    monkeypatch.setattr(gmail_tools, "MAX_ATTACHMENT_BYTES", len(_HELLO_WORLD))
+    gmail_tools._decode_and_write(_HELLO_WORLD_B64, str(save_path))
+    assert save_path.read_bytes() == _HELLO_WORLD
+
+def test_ensure_parent_dirs_creates_missing_directories(tmp_path):
+    save_paths = [str(tmp_path / "a" / "b" / "one.txt"), str(tmp_path / "a" / "b" / "two.txt"), str(tmp_path / "c" / "three.txt")]
+
+    gmail_tools._ensure_parent_dirs(save_paths)
+
+    assert (tmp_path / "a" / "b").is_dir()
+    assert (tmp_path / "c").is_dir()
+    assert not any(path.is_file() for path in tmp_path.rglob("*"))
+
+def test_decode_and_write_removes_partial_file_on_decode_error(tmp_path):
+    save_path = tmp_path / "partial.txt"
+    save_path.write_bytes(b"previous")
+    # the first chunk decodes and is written before the invalid tail is reached
+    file_data = "A" * gmail_tools.DECODE_CHUNK_SIZE + "!!!!"
+
+    with pytest.raises(binascii.Error):
+        gmail_tools._decode_and_write(file_data, str(save_path))
+    assert save_path.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [save_path]
+
+def test_decode_and_write_keeps_existing_file_when_open_fails(tmp_path, monkeypatch):
+    save_path = tmp_path / "existing.txt"
+    save_path.write_bytes(b"previous")
+
+    def fail_open(*args, **kwargs):
+        raise PermissionError("denied")
+
+    monkeypatch.setattr(gmail_tools.os, "open", fail_open)
+    with pytest.raises(PermissionError):
+        gmail_tools._decode_and_write(_HELLO_WORLD_B64, str(save_path))
+    monkeypatch.undo()
+    assert save_path.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [save_path]
+
+# Mock service results shared across tests, with the JSON the tools are expected to return
+# for them precomputed once. Tests must not mutate these.
+MOCK_QUERY_EMAILS = [{"id": "1", "snippet": "Test email"}]
+MOCK_QUERY_EMAILS_JSON = to_json(MOCK_QUERY_EMAILS)
+MOCK_CALENDARS = [{"id": "primary", "summary": "Primary Calendar"}, {"id": "holiday", "summary": "Holidays"}]
+MOCK_CALENDARS_JSON = to_json(MOCK_CALENDARS)
+MOCK_EVENTS = [{"id": "event_1", "summary": "Meeting"}]
+MOCK_EVENTS_JSON = to_json(MOCK_EVENTS)
+
+# (email, attachments) results of get_emails_by_ids_with_attachments, with attachments keyed
+# by part ID as GmailService returns them. The tools add "attachments" to the emails they are
+# given, so each call builds its own email dicts.
+_EMAIL_1_ATTACHMENTS = {"1": {"filename": "a.txt", "mimeType": "text/plain", "attachmentId": "att_a", "partId": "1"}}
+_EMAIL_2_ATTACHMENTS = {"1": {"filename": "b.pdf", "mimeType": "application/pdf", "attachmentId": "att_b", "partId": "1"}}
+_NONE_BUNDLE = (None, {})
+
+def _email_bundle(email_id, subject, attachments):
+    return {"id": email_id, "subject": subject}, attachments
 
 # Tests for Gmail Tools
-@pytest.mark.asyncio
 async def test_query_gmail_emails(mock_gmail_service, mcp_client):
     user_id = "test_user"
-    mock_gmail_service.query_emails.return_value = [{"id": "1", "snippet": "Test email"}]
+    mock_gmail_service.query_emails.return_value = MOCK_QUERY_EMAILS
     result_obj = await mcp_client.call_tool("query_gmail_emails", {"__user_id__": user_id, "query": "test", "max_results": 10})
     mock_gmail_service.query_emails.assert_called_once_with(query="test", max_results=10)
-    assert json.loads(result_obj[0].text) == [{"id": "1", "snippet": "Test email"}]
+    assert result_obj.content[0].text == MOCK_QUERY_EMAILS_JSON
 
-@pytest.mark.asyncio
-async def test_get_gmail_email(mock_gmail_service, mcp_client):
+def test_get_gmail_email(mock_gmail_service):
     user_id = "test_user"
     email_id = "email_123"
     mock_email_data = {"id": email_id, "subject": "Test Subject", "attachments": []}
-    mock_attachments = [{"attachmentId": "att1", "filename": "file.txt"}]
+    mock_attachments = {"1": {"filename": "file.txt", "mimeType": "text/plain", "attachmentId": "att1", "partId": "1"}}
     mock_gmail_service.get_email_by_id_with_attachments.return_value = (mock_email_data, mock_attachments)
 
-    result_obj = await mcp_client.call_tool("get_gmail_email", {"__user_id__": user_id, "email_id": email_id})
+    result_obj = gmail_tools.get_gmail_email(__user_id__=user_id, email_id=email_id)
     mock_gmail_service.get_email_by_id_with_attachments.assert_called_once_with(email_id)
     expected_email = mock_email_data.copy()
     expected_email["attachments"] = mock_attachments
-    assert json.loads(result_obj[0].text) == expected_email
+    assert _loads(result_obj) == expected_email
 
     # Test email not found
     mock_gmail_service.get_email_by_id_with_attachments.return_value = (None, [])
-    result_obj_not_found = await mcp_client.call_tool("get_gmail_email", {"__user_id__": user_id, "email_id": "non_existent"})
-    assert result_obj_not_found[0].text == "Failed to retrieve email with ID: non_existent"
+    result_obj_not_found = gmail_tools.get_gmail_email(__user_id__=user_id, email_id="non_existent")
+    assert result_obj_not_found == "Failed to retrieve email with ID: non_existent"
 
-@pytest.mark.asyncio
-async def test_bulk_get_gmail_emails(mock_gmail_service, mcp_client):
+async def test_bulk_get_gmail_emails(mock_gmail_service):
     user_id = "test_user"
     email_ids = ["email_1", "email_2", "email_3"]
-    mock_email_data_1 = {"id": "email_1", "subject": "Sub 1"}
-    mock_email_data_2 = {"id": "email_2", "subject": "Sub 2"}
-    mock_attachments_1 = [{"attachmentId": "att_a"}]
-    mock_attachments_2 = [{"attachmentId": "att_b"}]
 
     # Simulate one email found, one not found, one found
-    mock_gmail_service.get_email_by_id_with_attachments.side_effect = [
-        (mock_email_data_1, mock_attachments_1),
-        (None, []),
-        (mock_email_data_2, mock_attachments_2),
+    mock_gmail_service.get_emails_by_ids_with_attachments.return_value = [
+        _email_bundle("email_1", "Sub 1", _EMAIL_1_ATTACHMENTS),
+        _NONE_BUNDLE,
+        _email_bundle("email_2", "Sub 2", _EMAIL_2_ATTACHMENTS),
     ]
 
-    results_obj = await mcp_client.call_tool("bulk_get_gmail_emails", {"__user_id__": user_id, "email_ids": email_ids})
+    results_obj = await gmail_tools.bulk_get_gmail_emails(__user_id__=user_id, email_ids=email_ids)
 
-    assert mock_gmail_service.get_email_by_id_with_attachments.call_count == 3
-    loaded_results = json.loads(results_obj[0].text)
+    mock_gmail_service.get_emails_by_ids_with_attachments.assert_called_once_with(email_ids)
+    loaded_results = _loads(results_obj)
     assert len(loaded_results) == 2
     assert loaded_results[0]["id"] == "email_1"
     assert loaded_results[1]["id"] == "email_2"
-    assert loaded_results[0]["attachments"] == mock_attachments_1
-    assert loaded_results[1]["attachments"] == mock_attachments_2
+    assert loaded_results[0]["attachments"] == _EMAIL_1_ATTACHMENTS
+    assert loaded_results[1]["attachments"] == _EMAIL_2_ATTACHMENTS
 
     # Test no emails found
-    mock_gmail_service.get_email_by_id_with_attachments.side_effect = [(None, []), (None, [])]
-    result_obj_none_found = await mcp_client.call_tool("bulk_get_gmail_emails", {"__user_id__": user_id, "email_ids": ["e1", "e2"]})
-    assert result_obj_none_found[0].text == "Failed to retrieve any emails from the provided IDs"
+    mock_gmail_service.get_emails_by_ids_with_attachments.return_value = [_NONE_BUNDLE, _NONE_BUNDLE]
+    result_obj_none_found = await gmail_tools.bulk_get_gmail_emails(__user_id__=user_id, email_ids=["e1", "e2"])
+    assert result_obj_none_found == "Failed to retrieve any emails from the provided IDs"
 
-@pytest.mark.asyncio
-async def test_create_gmail_draft(mock_gmail_service, mcp_client):
+def test_create_gmail_draft(mock_gmail_service):
     user_id = "test_user"
     to = "recipient@example.com"
     subject = "Test Draft"
@@ -142,197 +257,231 @@ async def test_create_gmail_draft(mock_gmail_service, mcp_client):
     mock_draft = {"id": "draft_123", "subject": subject}
     mock_gmail_service.create_draft.return_value = mock_draft
 
-    result_obj = await mcp_client.call_tool("create_gmail_draft", {"__user_id__": user_id, "to": to, "subject": subject, "body": body})
+    result_obj = gmail_tools.create_gmail_draft(__user_id__=user_id, to=to, subject=subject, body=body)
     mock_gmail_service.create_draft.assert_called_once_with(to=to, subject=subject, body=body, cc=None)
-    assert json.loads(result_obj[0].text) == mock_draft
+    assert _loads(result_obj) == mock_draft
 
     # Test with CC
     cc = ["cc1@example.com", "cc2@example.com"]
-    mock_gmail_service.create_draft.reset_mock()
     mock_gmail_service.create_draft.return_value = {"id": "draft_456", "subject": subject}
-    result_obj_cc = await mcp_client.call_tool("create_gmail_draft", {"__user_id__": user_id, "to": to, "subject": subject, "body": body, "cc": cc})
-    mock_gmail_service.create_draft.assert_called_once_with(to=to, subject=subject, body=body, cc=cc)
-    assert json.loads(result_obj_cc[0].text)["id"] == "draft_456"
+    result_obj_cc = gmail_tools.create_gmail_draft(__user_id__=user_id, to=to, subject=subject, body=body, cc=cc)
+    # the first call is still recorded, so check the latest one rather than resetting the mock
+    assert mock_gmail_service.create_draft.call_args == call(to=to, subject=subject, body=body, cc=cc)
+    assert _loads(result_obj_cc)["id"] == "draft_456"
 
     # Test failure
     mock_gmail_service.create_draft.return_value = None
-    result_obj_fail = await mcp_client.call_tool("create_gmail_draft", {"__user_id__": user_id, "to": to, "subject": subject, "body": body})
-    assert result_obj_fail[0].text == "Failed to create draft email"
+    result_obj_fail = gmail_tools.create_gmail_draft(__user_id__=user_id, to=to, subject=subject, body=body)
+    assert result_obj_fail == "Failed to create draft email"
 
-@pytest.mark.asyncio
-async def test_delete_gmail_draft(mock_gmail_service, mcp_client):
+def test_delete_gmail_draft(mock_gmail_service):
     user_id = "test_user"
     draft_id = "draft_to_delete"
 
     mock_gmail_service.delete_draft.return_value = True
-    result_obj_success = await mcp_client.call_tool("delete_gmail_draft", {"__user_id__": user_id, "draft_id": draft_id})
+    result_obj_success = gmail_tools.delete_gmail_draft(__user_id__=user_id, draft_id=draft_id)
     mock_gmail_service.delete_draft.assert_called_once_with(draft_id)
-    assert result_obj_success[0].text == "Successfully deleted draft"
+    assert result_obj_success == "Successfully deleted draft"
 
     mock_gmail_service.delete_draft.return_value = False
-    result_obj_fail = await mcp_client.call_tool("delete_gmail_draft", {"__user_id__": user_id, "draft_id": draft_id})
-    assert result_obj_fail[0].text == f"Failed to delete draft with ID: {draft_id}"
+    result_obj_fail = gmail_tools.delete_gmail_draft(__user_id__=user_id, draft_id=draft_id)
+    assert result_obj_fail == f"Failed to delete draft with ID: {draft_id}"
+
+REPLY_ORIGINAL_MESSAGE_ID = "original_123"
+REPLY_BODY = "This is a reply."
+MOCK_ORIGINAL_MESSAGE = {"id": REPLY_ORIGINAL_MESSAGE_ID, "subject": "Original Subject", "payload": {"headers": [{"name": "From", "value": "sender@example.com"}]}}
 
-@pytest.mark.asyncio
-async def test_reply_gmail_email(mock_gmail_service, mcp_client):
+@pytest.mark.parametrize("case", ["draft", "send_cc", "original_missing", "reply_fail"])
+def test_reply_gmail_email(case, mock_gmail_service):
     user_id = "test_user"
-    original_message_id = "original_123"
-    reply_body = "This is a reply."
-    mock_original_message = {"id": original_message_id, "subject": "Original Subject", "payload": {"headers": [{"name": "From", "value": "sender@example.com"}]}}
-    mock_gmail_service.get_email_by_id_with_attachments.return_value = (mock_original_message, [])
-
-    # Test drafting a reply
-    mock_gmail_service.create_reply.return_value = {"id": "reply_draft_1", "status": "draft"}
-    result_obj_draft = await mcp_client.call_tool("reply_gmail_email", {"__user_id__": user_id, "original_message_id": original_message_id, "reply_body": reply_body, "send": False})
-    mock_gmail_service.get_email_by_id_with_attachments.assert_called_once_with(original_message_id)
-    mock_gmail_service.create_reply.assert_called_once_with(original_message=mock_original_message, reply_body=reply_body, send=False, cc=None)
-    assert json.loads(result_obj_draft[0].text)["id"] == "reply_draft_1"
-
-    # Test sending a reply with CC
-    mock_gmail_service.get_email_by_id_with_attachments.reset_mock()
-    mock_gmail_service.create_reply.reset_mock()
-    mock_gmail_service.get_email_by_id_with_attachments.return_value = (mock_original_message, [])
-    mock_gmail_service.create_reply.return_value = {"id": "reply_sent_1", "status": "sent"}
-    cc_recipients = ["cc_reply@example.com"]
-    result_obj_send_cc = await mcp_client.call_tool("reply_gmail_email", {"__user_id__": user_id, "original_message_id": original_message_id, "reply_body": reply_body, "send": True, "cc": cc_recipients})
-    mock_gmail_service.create_reply.assert_called_once_with(original_message=mock_original_message, reply_body=reply_body, send=True, cc=cc_recipients)
-    assert json.loads(result_obj_send_cc[0].text)["id"] == "reply_sent_1"
-
-    # Test original message not found
-    mock_gmail_service.get_email_by_id_with_attachments.reset_mock()
-    mock_gmail_service.get_email_by_id_with_attachments.return_value = (None, [])
-    result_obj_original_not_found = await mcp_client.call_tool("reply_gmail_email", {"__user_id__": user_id, "original_message_id": "non_existent", "reply_body": reply_body})
-    assert result_obj_original_not_found[0].text == "Failed to retrieve original message with ID: non_existent"
-
-    # Test create_reply failure
-    mock_gmail_service.get_email_by_id_with_attachments.reset_mock()
-    mock_gmail_service.create_reply.reset_mock()
-    mock_gmail_service.get_email_by_id_with_attachments.return_value = (mock_original_message, [])
-    mock_gmail_service.create_reply.return_value = None
-    result_obj_create_reply_fail = await mcp_client.call_tool("reply_gmail_email", {"__user_id__": user_id, "original_message_id": original_message_id, "reply_body": reply_body, "send": True})
-    assert result_obj_create_reply_fail[0].text == "Failed to send reply email"
-
-@pytest.mark.asyncio
-async def test_get_gmail_attachment(mock_gmail_service, tmp_path, mcp_client):
+    arguments = {"__user_id__": user_id, "original_message_id": REPLY_ORIGINAL_MESSAGE_ID, "reply_body": REPLY_BODY}
+    mock_gmail_service.get_email_by_id_with_attachments.return_value = (MOCK_ORIGINAL_MESSAGE, [])
+
+    if case == "draft":
+        # Test drafting a reply
+        mock_gmail_service.create_reply.return_value = {"id": "reply_draft_1", "status": "draft"}
+        result_obj_draft = gmail_tools.reply_gmail_email(**arguments, send=False)
+        mock_gmail_service.get_email_by_id_with_attachments.assert_called_once_with(REPLY_ORIGINAL_MESSAGE_ID)
+        mock_gmail_service.create_reply.assert_called_once_with(original_message=MOCK_ORIGINAL_MESSAGE, reply_body=REPLY_BODY, send=False, cc=None)
+        assert _loads(result_obj_draft)["id"] == "reply_draft_1"
+
+    elif case == "send_cc":
+        # Test sending a reply with CC
+        mock_gmail_service.create_reply.return_value = {"id": "reply_sent_1", "status": "sent"}
+        cc_recipients = ["cc_reply@example.com"]
+        result_obj_send_cc = gmail_tools.reply_gmail_email(**arguments, send=True, cc=cc_recipients)
+        mock_gmail_service.create_reply.assert_called_once_with(original_message=MOCK_ORIGINAL_MESSAGE, reply_body=REPLY_BODY, send=True, cc=cc_recipients)
+        assert _loads(result_obj_send_cc)["id"] == "reply_sent_1"
+
+    elif case == "original_missing":
+        # Test original message not found
+        mock_gmail_service.get_email_by_id_with_attachments.return_value = (None, [])
+        result_obj_original_not_found = gmail_tools.reply_gmail_email(**{**arguments, "original_message_id": "non_existent"}, send=False)
+        assert result_obj_original_not_found == "Failed to retrieve original message with ID: non_existent"
+        mock_gmail_service.create_reply.assert_not_called()
+
+    elif case == "reply_fail":
+        # Test create_reply failure
+        mock_gmail_service.create_reply.return_value = None
+        result_obj_create_reply_fail = gmail_tools.reply_gmail_email(**arguments, send=True)
+        assert result_obj_create_reply_fail == "Failed to send reply email"
+
+ATTACHMENT_MESSAGE_ID = "msg_123"
+ATTACHMENT_ID = "att_456"
+ATTACHMENT_FILENAME = "test.txt"
+EXPECTED_ATTACHMENT_URI = f"attachment://gmail/{ATTACHMENT_MESSAGE_ID}/{ATTACHMENT_ID}/{ATTACHMENT_FILENAME}"
+
+def test_get_gmail_attachment(mock_gmail_service, tmp_path):
     user_id = "test_user"
-    message_id = "msg_123"
-    attachment_id = "att_456"
+    message_id = ATTACHMENT_MESSAGE_ID
+    attachment_id = ATTACHMENT_ID
     mime_type = "text/plain"
-    filename = "test.txt"
-    file_content_base64 = "SGVsbG8gV29ybGQh" # "Hello World!"
+    filename = ATTACHMENT_FILENAME
+    file_content_base64 = _HELLO_WORLD_B64
     mock_gmail_service.get_attachment.return_value = {"data": file_content_base64}
 
     # Test returning EmbeddedResource
-    result_obj_resource = await mcp_client.call_tool("get_gmail_attachment", {
-        "__user_id__": user_id,
-        "message_id": message_id,
-        "attachment_id": attachment_id,
-        "mime_type": mime_type,
-        "filename": filename
-    })
+    result_obj_resource = gmail_tools.get_gmail_attachment(
+        __user_id__=user_id,
+        message_id=message_id,
+        attachment_id=attachment_id,
+        mime_type=mime_type,
+        filename=filename
+    )
     mock_gmail_service.get_attachment.assert_called_once_with(message_id, attachment_id)
-    assert isinstance(result_obj_resource[0], EmbeddedResource)
-    assert result_obj_resource[0].type == "resource"
-    assert isinstance(result_obj_resource[0].resource, BlobResourceContents)
-    assert result_obj_resource[0].resource.blob == file_content_base64
-    assert result_obj_resource[0].resource.mimeType == mime_type
-    assert str(result_obj_resource[0].resource.uri) == f"attachment://gmail/{message_id}/{attachment_id}/{filename}"
+    assert isinstance(result_obj_resource, EmbeddedResource)
+    assert result_obj_resource.type == "resource"
+    assert isinstance(result_obj_resource.resource, BlobResourceContents)
+    assert result_obj_resource.resource.blob == file_content_base64
+    assert result_obj_resource.resource.mimeType == mime_type
+    assert str(result_obj_resource.resource.uri) == EXPECTED_ATTACHMENT_URI
 
     # Test saving to disk
-    mock_gmail_service.get_attachment.reset_mock()
     save_path = tmp_path / "saved_file.txt"
-    result_obj_save = await mcp_client.call_tool("get_gmail_attachment", {
-        "__user_id__": user_id,
-        "message_id": message_id,
-        "attachment_id": attachment_id,
-        "mime_type": mime_type,
-        "filename": filename,
-        "save_to_disk": str(save_path)
-    })
-    assert result_obj_save[0].text == f"Attachment saved to disk: {save_path}"
-    assert save_path.read_bytes() == b"Hello World!"
+    result_obj_save = gmail_tools.get_gmail_attachment(
+        __user_id__=user_id,
+        message_id=message_id,
+        attachment_id=attachment_id,
+        mime_type=mime_type,
+        filename=filename,
+        save_to_disk=str(save_path)
+    )
+    assert result_obj_save == f"Attachment saved to disk: {save_path}"
+    assert save_path.read_bytes() == _HELLO_WORLD
 
     # Test attachment not found
-    mock_gmail_service.get_attachment.reset_mock()
     mock_gmail_service.get_attachment.return_value = None
-    result_obj_not_found = await mcp_client.call_tool("get_gmail_attachment", {
-        "__user_id__": user_id,
-        "message_id": message_id,
-        "attachment_id": "non_existent_att",
-        "mime_type": mime_type,
-        "filename": filename
-    })
-    assert result_obj_not_found[0].text == f"Failed to retrieve attachment with ID: non_existent_att from message: {message_id}"
-
-@pytest.mark.asyncio
-async def test_bulk_save_gmail_attachments(mock_gmail_service, tmp_path, mcp_client):
+    result_obj_not_found = gmail_tools.get_gmail_attachment(
+        __user_id__=user_id,
+        message_id=message_id,
+        attachment_id="non_existent_att",
+        mime_type=mime_type,
+        filename=filename
+    )
+    assert mock_gmail_service.get_attachment.call_args == call(message_id, "non_existent_att")
+    assert result_obj_not_found == f"Failed to retrieve attachment with ID: non_existent_att from message: {message_id}"
+
+# Attachment writes captured in memory instead of on disk, keyed by save path.
+# test_get_gmail_attachment still writes a real file end to end.
+@pytest.fixture
+def captured_writes(monkeypatch):
+    captured = {}
+    monkeypatch.setattr(gmail_tools, "_ensure_parent_dirs", lambda save_paths: None)
+    monkeypatch.setattr(
+        gmail_tools, "_decode_and_write",
+        lambda file_data, save_path: captured.__setitem__(save_path, gmail_tools.decode_base64_data(file_data)),
+    )
+    return captured
+
+async def test_bulk_save_gmail_attachments(mock_gmail_service, captured_writes):
     user_id = "test_user"
     attachments_info = [
-        {"message_id": "msg_1", "part_id": "part_a", "save_path": str(tmp_path / "file1.txt")},
-        {"message_id": "msg_2", "part_id": "part_b", "save_path": str(tmp_path / "file2.txt")},
-        {"message_id": "msg_3", "part_id": "part_c", "save_path": str(tmp_path / "file3.txt")},
+        {"message_id": "msg_1", "part_id": "part_a", "save_path": "saved/file1.txt"},
+        {"message_id": "msg_2", "part_id": "part_b", "save_path": "saved/file2.txt"},
+        {"message_id": "msg_3", "part_id": "part_c", "save_path": "saved/file3.txt"},
     ]
 
-    # Mock return values for get_email_by_id_with_attachments and get_attachment
-    mock_gmail_service.get_email_by_id_with_attachments.side_effect = [
-        ({"id": "msg_1"}, {"part_a": {"attachmentId": "att_1"}}), # msg_1 found
-        ({"id": "msg_2"}, {"part_b": {"attachmentId": "att_2"}}), # msg_2 found
-        (None, {}), # msg_3 not found
+    # Mock return values for get_attachment_maps and get_attachments
+    mock_gmail_service.get_attachment_maps.return_value = [
+        {"part_a": {"filename": "file1.txt", "mimeType": "text/plain", "attachmentId": "att_1", "partId": "part_a"}}, # msg_1 found
+        {"part_b": {"filename": "file2.txt", "mimeType": "text/plain", "attachmentId": "att_2", "partId": "part_b"}}, # msg_2 found
+        None, # msg_3 not found
     ]
-    mock_gmail_service.get_attachment.side_effect = [
-        {"data": "SGVsbG8gMQ=="}, # "Hello 1" for att_1
-        {"data": "SGVsbG8gMg=="}, # "Hello 2" for att_2
+    mock_gmail_service.get_attachments.return_value = [
+        {"data": _HELLO_1_B64}, # for att_1
+        {"data": _HELLO_2_B64}, # for att_2
     ]
 
-    results_obj = await mcp_client.call_tool("bulk_save_gmail_attachments", {"__user_id__": user_id, "attachments": attachments_info})
+    results_obj = await gmail_tools.bulk_save_gmail_attachments(__user_id__=user_id, attachments=attachments_info)
 
-    assert mock_gmail_service.get_email_by_id_with_attachments.call_count == 3
+    mock_gmail_service.get_attachment_maps.assert_called_once_with(["msg_1", "msg_2", "msg_3"])
+    mock_gmail_service.get_attachments.assert_called_once_with([("msg_1", "att_1"), ("msg_2", "att_2")])
     assert len(results_obj) == 3
-    assert results_obj[0].text == f"Attachment saved to: {tmp_path / 'file1.txt'}"
-    assert results_obj[1].text == f"Attachment saved to: {tmp_path / 'file2.txt'}"
+    assert results_obj[0].text == "Attachment saved to: saved/file1.txt"
+    assert results_obj[1].text == "Attachment saved to: saved/file2.txt"
     assert results_obj[2].text == "Failed to retrieve message with ID: msg_3"
 
-    assert (tmp_path / "file1.txt").read_bytes() == b"Hello 1"
-    assert (tmp_path / "file2.txt").read_bytes() == b"Hello 2"
-    assert not (tmp_path / "file3.txt").exists()
+    assert captured_writes == {"saved/file1.txt": _HELLO_1, "saved/file2.txt": _HELLO_2}
 
     # Test attachment not found for a message that was found
-    mock_gmail_service.get_email_by_id_with_attachments.side_effect = [
-        ({"id": "msg_4"}, {"part_d": {"attachmentId": "att_4"}}),
+    mock_gmail_service.get_attachment_maps.return_value = [
+        {"part_d": {"filename": "file4.txt", "mimeType": "text/plain", "attachmentId": "att_4", "partId": "part_d"}},
     ]
-    mock_gmail_service.get_attachment.side_effect = [None]
-    results_obj_att_not_found = await mcp_client.call_tool("bulk_save_gmail_attachments", {"__user_id__": user_id, "attachments": [{"message_id": "msg_4", "part_id": "part_d", "save_path": str(tmp_path / "file4.txt")}]})
+    mock_gmail_service.get_attachments.return_value = [None]
+    results_obj_att_not_found = await gmail_tools.bulk_save_gmail_attachments(__user_id__=user_id, attachments=[{"message_id": "msg_4", "part_id": "part_d", "save_path": "saved/file4.txt"}])
     assert results_obj_att_not_found[0].text == "Failed to retrieve attachment with ID: att_4 from message: msg_4"
 
+async def test_bulk_save_gmail_attachments_dedups_and_bypasses_lookup(mock_gmail_service, captured_writes):
+    user_id = "test_user"
+    attachments_info = [
+        {"message_id": "msg_1", "part_id": "part_a", "save_path": "saved/a1.txt"},
+        # same message again: looked up once; same attachment again: fetched once
+        {"message_id": "msg_1", "part_id": "part_a", "save_path": "saved/a2.txt"},
+        {"message_id": "msg_1", "part_id": "part_x", "save_path": "saved/x.txt"},
+        # a direct attachment ID skips the message lookup
+        {"message_id": "msg_2", "attachment_id": "att_2", "save_path": "saved/b.txt"},
+    ]
+    mock_gmail_service.get_attachment_maps.return_value = [
+        {"part_a": {"filename": "a.txt", "mimeType": "text/plain", "attachmentId": "att_1", "partId": "part_a"}},
+    ]
+    mock_gmail_service.get_attachments.return_value = [{"data": _HELLO_1_B64}, {"data": _HELLO_2_B64}]
+
+    results_obj = await gmail_tools.bulk_save_gmail_attachments(__user_id__=user_id, attachments=attachments_info)
+
+    mock_gmail_service.get_attachment_maps.assert_called_once_with(["msg_1"])
+    mock_gmail_service.get_attachments.assert_called_once_with([("msg_1", "att_1"), ("msg_2", "att_2")])
+    assert [result.text for result in results_obj] == [
+        "Attachment saved to: saved/a1.txt",
+        "Attachment saved to: saved/a2.txt",
+        "Failed to find attachment with part ID: part_x in message: msg_1",
+        "Attachment saved to: saved/b.txt",
+    ]
+    assert captured_writes == {"saved/a1.txt": _HELLO_1, "saved/a2.txt": _HELLO_1, "saved/b.txt": _HELLO_2}
+
 # Tests for Calendar Tools
-@pytest.mark.asyncio
-async def test_list_calendars(mock_calendar_service, mcp_client):
+def test_list_calendars(mock_calendar_service):
     user_id = "test_user"
-    mock_calendars = [{"id": "primary", "summary": "Primary Calendar"}, {"id": "holiday", "summary": "Holidays"}]
-    mock_calendar_service.list_calendars.return_value = mock_calendars
+    mock_calendar_service.list_calendars.return_value = MOCK_CALENDARS
 
-    result_obj = await mcp_client.call_tool("list_calendars", {"__user_id__": user_id})
+    result_obj = calendar_tools.list_calendars(__user_id__=user_id)
     mock_calendar_service.list_calendars.assert_called_once()
-    assert json.loads(result_obj[0].text) == mock_calendars
+    assert result_obj == MOCK_CALENDARS_JSON
 
-@pytest.mark.asyncio
-async def test_get_calendar_events(mock_calendar_service, mcp_client):
+def test_get_calendar_events(mock_calendar_service):
     user_id = "test_user"
-    mock_events = [{"id": "event_1", "summary": "Meeting"}]
-    mock_calendar_service.get_events.return_value = mock_events
+    mock_calendar_service.get_events.return_value = MOCK_EVENTS
 
-    result_obj = await mcp_client.call_tool("get_calendar_events", {"__user_id__": user_id, "time_min": "2023-01-01T00:00:00Z", "calendar_id": "primary"})
+    result_obj = calendar_tools.get_calendar_events(__user_id__=user_id, time_min="2023-01-01T00:00:00Z", __calendar_id__="primary")
     mock_calendar_service.get_events.assert_called_once_with(
         time_min="2023-01-01T00:00:00Z",
         time_max=None,
-        max_results=250,
+        max_results=25,
         show_deleted=False,
         calendar_id="primary"
     )
-    assert json.loads(result_obj[0].text) == mock_events
+    assert result_obj == MOCK_EVENTS_JSON
 
-@pytest.mark.asyncio
-async def test_create_calendar_event(mock_calendar_service, mcp_client):
+def test_create_calendar_event(mock_calendar_service):
     user_id = "test_user"
     summary = "Test Event"
     start_time = "2023-01-01T10:00:00Z"
@@ -340,14 +489,14 @@ async def test_create_calendar_event(mock_calendar_service, mcp_client):
     mock_event = {"id": "new_event_1", "summary": summary}
     mock_calendar_service.create_event.return_value = mock_event
 
-    result_obj = await mcp_client.call_tool("create_calendar_event", {
-        "__user_id__": user_id,
-        "summary": summary,
-        "start_time": start_time,
-        "end_time": end_time,
-        "location": "Test Location",
-        "attendees": ["attendee@example.com"]
-    })
+    result_obj = calendar_tools.create_calendar_event(
+        __user_id__=user_id,
+        summary=summary,
+        start_time=start_time,
+        end_time=end_time,
+        location="Test Location",
+        attendees=["attendee@example.com"]
+    )
     mock_calendar_service.create_event.assert_called_once_with(
         summary=summary,
         start_time=start_time,
@@ -359,22 +508,21 @@ async def test_create_calendar_event(mock_calendar_service, mcp_client):
         timezone=None,
         calendar_id="primary"
     )
-    assert json.loads(result_obj[0].text) == mock_event
+    assert _loads(result_obj) == mock_event
 
-@pytest.mark.asyncio
-async def test_delete_calendar_event(mock_calendar_service, mcp_client):
+def test_delete_calendar_event(mock_calendar_service):
     user_id = "test_user"
     event_id = "event_to_delete"
 
     mock_calendar_service.delete_event.return_value = True
-    result_obj_success = await mcp_client.call_tool("delete_calendar_event", {"__user_id__": user_id, "event_id": event_id})
+    result_obj_success = calendar_tools.delete_calendar_event(__user_id__=user_id, event_id=event_id)
     mock_calendar_service.delete_event.assert_called_once_with(
         event_id=event_id,
         send_notifications=True,
         calendar_id="primary"
     )
-    assert json.loads(result_obj_success[0].text) == {"success": True, "message": "Event successfully deleted"}
+    assert _loads(result_obj_success) == {"success": True, "message": "Event successfully deleted"}
 
     mock_calendar_service.delete_event.return_value = False
-    result_obj_fail = await mcp_client.call_tool("delete_calendar_event", {"__user_id__": user_id, "event_id": event_id})
-    assert json.loads(result_obj_fail[0].text) == {"success": False, "message": "Failed to delete event"}
\ No newline at end of file
+    result_obj_fail = calendar_tools.delete_calendar_event(__user_id__=user_id, event_id=event_id)
+    assert _loads(result_obj_fail) == {"success": False, "message": "Failed to delete event"}
\ No newline at end of file
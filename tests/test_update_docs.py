@@ -0,0 +1,54 @@
+import os
+import stat
+from unittest.mock import MagicMock
+
+import requests
+
+from mcp_gsuite.utils import update_docs
+
+DOC_ITEM = {"title": "doc.txt", "url": "https://example.com/llms-full.txt"}
+
+
+def make_session(*chunks, error=None):
+    def iter_content(chunk_size):
+        yield from chunks
+        if error is not None:
+            raise error
+
+    response = MagicMock()
+    response.iter_content.side_effect = iter_content
+    session = MagicMock()
+    session.get.return_value.__enter__.return_value = response
+    return session
+
+
+def test_download_doc_writes_new_doc_with_default_mode(tmp_path):
+    update_docs.download_doc(make_session(b"new ", b"doc"), str(tmp_path), DOC_ITEM)
+
+    doc_path = tmp_path / "doc.txt"
+    assert doc_path.read_bytes() == b"new doc"
+    assert stat.S_IMODE(os.stat(doc_path).st_mode) == update_docs.NEW_DOC_MODE
+    assert list(tmp_path.iterdir()) == [doc_path]
+
+
+def test_download_doc_keeps_mode_of_replaced_doc(tmp_path):
+    doc_path = tmp_path / "doc.txt"
+    doc_path.write_bytes(b"old doc")
+    os.chmod(doc_path, 0o640)
+
+    update_docs.download_doc(make_session(b"new doc"), str(tmp_path), DOC_ITEM)
+
+    assert doc_path.read_bytes() == b"new doc"
+    assert stat.S_IMODE(os.stat(doc_path).st_mode) == 0o640
+
+
+def test_download_doc_keeps_previous_doc_when_download_fails(tmp_path):
+    doc_path = tmp_path / "doc.txt"
+    doc_path.write_bytes(b"old doc")
+    # part of the body is written before the connection drops
+    session = make_session(b"partial", error=requests.exceptions.ChunkedEncodingError("connection broken"))
+
+    update_docs.download_doc(session, str(tmp_path), DOC_ITEM)
+
+    assert doc_path.read_bytes() == b"old doc"
+    assert list(tmp_path.iterdir()) == [doc_path]